@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Micro-benchmark do parser estrutural (meteologix_parser) sobre as páginas
+# sintéticas de benchmarks/fixtures, e da conversão vetorizada de horários x
+# fromtimestamp item a item. As fixtures não são respostas reais: não há
+# comparação com os parsers antigos, que dependiam das linhas da página real.
+#
+#   python benchmarks/bench_meteologix_parser.py
+
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src" / "data"))
+
+from meteologix_parser import (  # noqa: E402
+    parse_hc_blocks,
+    parse_row_blocks,
+    split_series,
+)
+
+FIXTURES = ROOT / "benchmarks" / "fixtures"
+XLTREND = (FIXTURES / "meteologix_xltrend.html").read_text(encoding="utf-8")
+ENSEMBLE = (FIXTURES / "meteologix_ensemble.html").read_text(encoding="utf-8")
+TZ = ZoneInfo("America/Sao_Paulo")
+
+
+# --------------------------------------------------------------------
+# Horários: conversão item a item antiga x vetorizada (independe da página)
+# --------------------------------------------------------------------
+def legacy_times(blocks):
+    # conversão item a item do antigo extract_series / ramos do codigo8
+    for item in blocks:
+        raw = item["data"]
+        [
+            datetime.fromtimestamp(int(ms) / 1000.0, tz=timezone.utc)
+            .astimezone(TZ)
+            .replace(tzinfo=None)
+            for ms in raw[0::2]
+        ]
+
+
+def new_times(blocks):
+    for item in blocks:
+        split_series(item["data"], TZ)
+
+
+def new_rain(html):
+    return parse_hc_blocks(html, names=("hc_data_rain_day",))["hc_data_rain_day"]
+
+
+def new_temp(html):
+    return parse_hc_blocks(html, names=("hc_data_temp",))["hc_data_temp"]
+
+
+def new_all_blocks(html):
+    return parse_hc_blocks(html)
+
+
+def new_ensemble(html):
+    return parse_row_blocks(html)[0]
+
+
+# --------------------------------------------------------------------
+# Conferência + tempos
+# --------------------------------------------------------------------
+def check():
+    assert new_rain(XLTREND) and new_temp(XLTREND) and new_ensemble(ENSEMBLE)
+    item = new_temp(XLTREND)[0]
+    _, times = split_series(item["data"], TZ)
+    assert list(times.to_pydatetime()) == [
+        datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+        .astimezone(TZ)
+        .replace(tzinfo=None)
+        for ms in item["data"][0::2]
+    ]
+    blocks = parse_hc_blocks(XLTREND)
+    print(f"blocos: {list(blocks)} | modelos: {len(blocks['hc_data_rain_day'])}")
+
+
+def bench(label, func, text, number=200):
+    best = min(timeit.repeat(lambda: func(text), number=number, repeat=5)) / number
+    print(f"{label:<28} {best * 1e6:10.1f} µs/estação")
+    return best
+
+
+def main():
+    check()
+    bench("chuva: parser estrutural", new_rain, XLTREND)
+    bench("temp: parser estrutural", new_temp, XLTREND)
+    bench("todos os blocos hc_data_*", new_all_blocks, XLTREND)
+    temp = parse_hc_blocks(XLTREND)["hc_data_temp"]
+    old = bench("horários: fromtimestamp", legacy_times, temp)
+    new = bench("horários: split_series", new_times, temp)
+    print(f"{'':<28} {old / new:10.2f}x")
+    bench("ensemble: parse_row_blocks", new_ensemble, ENSEMBLE)
+
+
+if __name__ == "__main__":
+    main()
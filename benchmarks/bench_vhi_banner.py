@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Micro-benchmark: detecção do banner "sem dados" do VHI, laço por pixel (antigo) x
+# NumPy (codigo9.has_no_data_banner). Roda nos PNGs já salvos em vhi_images/ e
+# confere que os veredictos são idênticos.
+#
+#   python benchmarks/bench_vhi_banner.py
+
+import sys
+import timeit
+from pathlib import Path
+
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src" / "data"))
+
+from codigo9_dadosVhi import has_no_data_banner  # noqa: E402
+
+IMAGES = sorted((ROOT / "vhi_images").glob("*.png"))
+
+
+def legacy_has_no_data_banner(img):
+    # cópia da versão antiga do codigo9
+    w, h = img.size
+    bands = [
+        img.crop((0, 0, w, max(1, int(h * 0.12)))).convert("RGB"),
+        img.crop((0, max(0, int(h * 0.88)), w, h)).convert("RGB"),
+    ]
+    for band in bands:
+        red_pixels = 0
+        for r, g, b in band.getdata():
+            if r >= 180 and g <= 100 and b <= 100:
+                red_pixels += 1
+        ratio = red_pixels / max(1, band.size[0] * band.size[1])
+        if ratio > 0.00025:
+            return True
+    return False
+
+
+def bench(label, func, images, number=5):
+    best = min(
+        timeit.repeat(lambda: [func(im) for im in images], number=number, repeat=3)
+    )
+    per_image = best / number / len(images)
+    print(f"{label:<22} {per_image * 1e3:8.2f} ms/imagem")
+    return per_image
+
+
+def main():
+    if not IMAGES:
+        raise SystemExit("Nenhum PNG em vhi_images/ (rode o codigo9 antes).")
+    images = []
+    for path in IMAGES:
+        im = Image.open(path)
+        im.load()  # decodifica fora da medição
+        images.append(im)
+
+    for path, im in zip(IMAGES, images):
+        old, new = legacy_has_no_data_banner(im), has_no_data_banner(im)
+        assert old == new, f"veredicto diferente em {path.name}: {old} x {new}"
+        print(f"{path.name:<42} {im.mode:<5} {im.size} banner={new}")
+
+    old = bench("laço por pixel", legacy_has_no_data_banner, images)
+    new = bench("numpy", has_no_data_banner, images)
+    print(f"{'':<22} {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,8 @@
 @echo off
 call .venv\Scripts\activate
 
-echo === Cecafe download ===
-python src\data\codigo3_baixar_excel_cecafe.py
-if errorlevel 1 goto :error
-
-
-echo === Rains webscraping ===
-python src\data\codigo7_scrape_rain.py
-if errorlevel 1 goto :error
-
-echo === Min Temps webscraping ===
-python src\data\codigo8_scrape_temp.py
+echo === Pipeline: Cecafe + chuvas + temperaturas minimas ===
+python src\data\pipeline.py cecafe chuva temp_min
 if errorlevel 1 goto :error
 
 echo === Concluido com sucesso ===
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Números no formato brasileiro ("1.234,56", "-0,50%", "R$ 2.145,30") para float,
+# coluna inteira de uma vez com os métodos .str do pandas, sem laço por célula.
+# Células vazias, "-", "n/d" e afins viram NaN.
+
+import pandas as pd
+
+# símbolos que aparecem junto dos números nas tabelas (moeda, %, espaços)
+_NOISE = r"[R$US%\s +*]"
+
+
+def parse_br_number(values: pd.Series, percent: bool = False) -> pd.Series:
+    """Série float64; com `percent`, divide por 100 ("-0,50%" -> -0.005)."""
+    if pd.api.types.is_numeric_dtype(values):
+        # já numérica (ex.: read_html com decimal=","): só ajusta a escala
+        out = values.astype("float64")
+    else:
+        text = (
+            values.astype(str)  # NaN/None viram "nan"/"None" e caem no coerce
+            .str.replace(_NOISE, "", regex=True)
+            .str.replace("−", "-", regex=False)  # sinal de menos tipográfico
+            .str.replace(".", "", regex=False)  # milhar
+            .str.replace(",", ".", regex=False)  # decimal
+        )
+        out = pd.to_numeric(text, errors="coerce").astype("float64")
+    return out / 100.0 if percent else out
+
+
+def parse_br_columns(df: pd.DataFrame, numbers=(), percents=()) -> pd.DataFrame:
+    """Cópia de `df` com as colunas indicadas convertidas (ausentes são ignoradas)."""
+    df = df.copy()
+    for col in numbers:
+        if col in df.columns:
+            df[col] = parse_br_number(df[col])
+    for col in percents:
+        if col in df.columns:
+            df[col] = parse_br_number(df[col], percent=True)
+    return df
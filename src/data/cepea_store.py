@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Histórico dos indicadores CEPEA de café (código 6) num CSV por produto, chaveado
+# pela data do indicador. A página do CEPEA só mostra os últimos dias: cada coleta
+# acrescenta os que faltam e a primeira carga importa os CSVs datados já salvos
+# (Arabica_AAAA-MM-DD.csv / Conilon_AAAA-MM-DD.csv), reconstruindo a série.
+#
+#   data/processed/cepea/<produto>.csv   (date, brl, var_day, var_month, usd)
+
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+
+STORE_DIR = Path("data/processed/cepea")
+
+# cabeçalho da tabela do CEPEA (já convertida) -> coluna no histórico
+COLUMNS = {
+    "Data": "date",
+    "Valor R$": "brl",
+    "Var./Dia": "var_day",
+    "Var./Mês": "var_month",
+    "Valor US$": "usd",
+}
+
+_DATED_CSV = re.compile(r"_(\d{4}-\d{2}-\d{2})\.csv$")
+
+
+def store_path(product: str, base_dir=STORE_DIR) -> Path:
+    return Path(base_dir) / f"{product.lower()}.csv"
+
+
+def normalize(table: pd.DataFrame) -> pd.DataFrame:
+    """Tabela do CEPEA (números já convertidos) no formato do histórico."""
+    table = table.rename(columns=lambda c: str(c).strip().rstrip("*").strip())
+    df = table.rename(columns=COLUMNS).reindex(columns=list(COLUMNS.values()))
+    df["date"] = pd.to_datetime(df["date"], format="%d/%m/%Y", errors="coerce")
+    return df.dropna(subset=["date"])
+
+
+def load(product: str, base_dir=STORE_DIR) -> pd.DataFrame:
+    path = store_path(product, base_dir)
+    if not path.exists():
+        return pd.DataFrame(columns=list(COLUMNS.values()))
+    return pd.read_csv(path, parse_dates=["date"])
+
+
+def upsert(product: str, tables, base_dir=STORE_DIR) -> int:
+    """Mescla tabelas (mais novas por último) no histórico; devolve nº de datas novas."""
+    stored = load(product, base_dir)
+    fresh = pd.concat([normalize(t) for t in tables], ignore_index=True)
+    added = fresh.loc[~fresh["date"].isin(stored["date"]), "date"].nunique()
+    # a mesma data em coletas diferentes: vale a mais recente (CEPEA revisa)
+    merged = pd.concat([stored, fresh], ignore_index=True)
+    merged = merged.drop_duplicates("date", keep="last").sort_values("date")
+
+    path = store_path(product, base_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".csv.part")
+    merged.to_csv(tmp, index=False, date_format="%Y-%m-%d")
+    os.replace(tmp, path)
+    return int(added)
+
+
+def ingest_dated_csvs(product: str, folder, prefix: str, base_dir=STORE_DIR) -> int:
+    """Importa os `<prefix>_AAAA-MM-DD.csv` de `folder`, do mais antigo ao mais novo."""
+    files = sorted(
+        (m.group(1), p)
+        for p in Path(folder).glob(f"{prefix}_*.csv")
+        if (m := _DATED_CSV.search(p.name))
+    )
+    if not files:
+        return 0
+    added = upsert(product, [pd.read_csv(p) for _, p in files], base_dir)
+    print(f"[OK] CEPEA {product}: {len(files)} CSVs importados, {added} datas")
+    return added
@@ -2,48 +2,23 @@
 # Código 2: Processamento de Temperaturas Mínimas (equivalente em Python)
 
 import re
-import requests
 from pathlib import Path
 
+from forecast_archive import append_runs
+from forecast_store import ForecastStore
+from meteologix_client import get_client, station_id
+from meteologix_parser import parse_row_blocks, run_string, split_rows
+from raw_archive import RawArchive
+
 BASE_DIR = Path(
     r"C:/Users/vinicius.pereira/OneDrive - ED & F Man Holding Limited/Clima/Daily/GFS/MinTemp"
 )
-BASE_DIR.mkdir(parents=True, exist_ok=True)
 
-response_file_path = BASE_DIR / "response.txt"
 mean_temp_file_path = BASE_DIR / "GFSMeanTemp.txt"
 min_temp_file_path = BASE_DIR / "GFSMinTemp.txt"
 model_runtime_file_path = BASE_DIR / "GFSmodelruntime.txt"
 url_list_path = BASE_DIR / "mintempupdatedurllisttemp.txt"
 
-for p in (
-    response_file_path,
-    mean_temp_file_path,
-    min_temp_file_path,
-    model_runtime_file_path,
-):
-    if p.exists():
-        p.unlink()
-
-cookies_string = "_live_xx_csrf_image=2febdbe850d0374afcf528ffe33bbd967bbcca66ccfac690617d69c4dcb36257a%3A2%3A%7Bi%3A0%3Bs%3A19%3A%22_live_xx_csrf_image%22%3Bi%3A1%3Bs%3A40%3A%22a12a5246199b2e145d3fb9a926f18079bb0c314c%22%3B%7D; _csrf=0ff96b65d424b84f36386a8dd0508ab6d62d0e84cc823d74bc53eac96c1b6a77a%3A2%3A%7Bi%3A0%3Bs%3A5%3A%22_csrf%22%3Bi%3A1%3Bs%3A32%3A%22qzRzxHyCnACgJVifjCI-wQguhcGaub44%22%3B%7D; _sp_v1_uid=1:692:5ed2d058-66ea-4be9-bb4e-1549d575c732; _sp_v1_data=2:378381:1631953984:0:6:0:6:0:0:_:-1; _sp_v1_ss=1:H4sIAAAAAAAAAItWqo5RKimOUbKKBjLyQAyD2lidGKVUEDOvNCcHyC4BK6iurVXSQVFegqQGq3oqGRSjlJmXWQJkGZoZG1qaGltaWhBnNj63EassFgA5qKJCIwEAAA%3D%3D; _sp_v1_opt=1:login|true:last_id|11:; _sp_v1_consent=1!1:1:1:0:0:0; _sp_v1_csv=null; _sp_v1_lt=1:; consentUUID=951e2981-1fe8-4eea-81ed-ed795fdc0c58; axd=4272046225751507569; session_id=45708977-047c-43a9-bd78-366e6a75c160; live_xx_history=6a208e388855c7fa39bad20eae82ea9c625df7377ebfb10de83222b1d61087aca%3A2%3A%7Bi%3A0%3Bs%3A15%3A%22live_xx_history%22%3Bi%3A1%3Ba%3A1%3A%7Bi%3A0%3Bi%3A3472603%3B%7D%7D"
-
-COMMON_HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 6.1; Win64; x64; rv:92.0) Gecko/20100101 Firefox/92.0",
-    "Accept": "*/*",
-    "Accept-Language": "en-US,en;q=0.5",
-    "X-CSRF-Token": "2HQASjoZ-7XwwRySosuCr5FDOyXs8sX-HiAORlAm3aKpDlIwQlGC9p6AX_XonevJ-wByCJujoot2Q0knJUTplg==",
-    "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-    "X-Requested-With": "XMLHttpRequest",
-    "Origin": "https://meteologix.com",
-    "DNT": "1",
-    "Connection": "keep-alive",
-    "Sec-Fetch-Dest": "empty",
-    "Sec-Fetch-Mode": "cors",
-    "Sec-Fetch-Site": "same-origin",
-    "TE": "trailers",
-    "Cookie": cookies_string,
-}
-
 
 def parse_slice(lines, start_1based, end_1based):
     return lines[start_1based - 1 : end_1based]
@@ -76,41 +51,59 @@ def extract_first_value(block_lines):
 
 
 def main():
+    BASE_DIR.mkdir(parents=True, exist_ok=True)
     if not url_list_path.exists():
         raise FileNotFoundError(str(url_list_path))
 
     with url_list_path.open("r", encoding="utf-8") as f:
         lines = [ln.strip() for ln in f if ln.strip()]
 
+    client = get_client()
+
+    # baixa tudo antes de apagar as saídas anteriores (respostas em cache por ciclo)
+    responses = [
+        client.fetch_ensemble_cached(
+            station_id(i),
+            model="usa",
+            param="mintemperatur",
+            referer_url=i,
+            region="in",
+        )
+        for i in lines
+    ]
+    if client.already_processed("gfs_min_temp", responses):
+        print("[SKIP] GFS MinTemp: rodada já processada na última coleta.")
+        return
+
+    for p in (
+        mean_temp_file_path,
+        min_temp_file_path,
+        model_runtime_file_path,
+    ):
+        if p.exists():
+            p.unlink()
+
+    # mesmas séries, com horários, para o histórico de rodadas
+    store = ForecastStore()
+    # respostas brutas só com RAW_ARCHIVE=1 (um .jsonl.gz por execução)
+    raw = RawArchive("gfs_min_temp")
+
     with (
         mean_temp_file_path.open("a", encoding="utf-8") as f_mean,
         min_temp_file_path.open("a", encoding="utf-8") as f_min,
         model_runtime_file_path.open("a", encoding="utf-8") as f_rt,
     ):
-        for i in lines:
+        for i, response in zip(lines, responses):
             refererurl = i
             stnname = i[43 : len(i) - 37].title()
-            stnid = i[35:42]
-
-            headers = dict(COMMON_HEADERS)
-            headers["Referer"] = refererurl
-            data = {
-                "city_id": stnid,
-                "model": "usa",
-                "model_view": "range",
-                "param": "mintemperatur",
-            }
-
-            resp = requests.post(
-                "https://meteologix.com/in/ajax/ensemble",
-                headers=headers,
-                data=data,
-                timeout=120,
-            )
-            resp.raise_for_status()
-            response_file_path.write_text(resp.text, encoding="utf-8")
-
-            fp = response_file_path.read_text(encoding="utf-8").splitlines()
+
+            text = response.text
+            if text is None:
+                print(f"[ERRO] Sem resposta: {refererurl}")
+                continue
+            raw.add(stnname, text)
+
+            fp = text.splitlines()
 
             x1 = parse_slice(fp, 21, 125)
             chart1 = [stnname, *extract_round_values(x1)]
@@ -124,6 +117,18 @@ def main():
             mt = rl[26:41]  # R str_sub(27,41) -> Python [26:41)
             f_rt.write(f"{stnname} {mt}\n")
 
+            # blocos de média e de faixa (mín.); a rodada é a chave do histórico
+            run = run_string(text) or mt.strip()
+            blocks = parse_row_blocks(text)
+            for model, rows in zip(("GFS-ENS mean", "GFS-ENS min"), blocks):
+                values, times = split_rows(rows, "UTC")
+                store.append(stnname, model, run, times, values)
+
+    raw.save()
+    append_runs(store.frame(), "gfs_min_temp", tz="UTC")
+    # só com as saídas gravadas: se algo acima falhar, a rodada é refeita
+    client.mark_processed("gfs_min_temp", responses)
+
 
 if __name__ == "__main__":
     main()
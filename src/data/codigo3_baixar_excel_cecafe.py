@@ -1,18 +1,40 @@
 # -*- coding: utf-8 -*-
 # Código 3: Baixar Arquivo Excel (equivalente em Python)
+# Download condicional (http_download.py): só grava uma nova cópia datada quando a
+# planilha do CECAFE realmente mudou.
 
-import requests
 from datetime import date
 from pathlib import Path
 
+from http_download import fetch_if_changed, load_state, save_state, sha256_file
+
 url = "https://www.cecafe.com.br/site/wp-content/uploads/graficos/cecafe-exportacao-resumo-diario.xlsx"
 
-resp = requests.get(url, timeout=720)
-if resp.status_code == 200:
-    folder = Path("data/raw/cecafe")
+folder = Path("data/raw/cecafe")
+state_file = folder / "_download.json"  # ETag/Last-Modified + sha256 da última
+
+
+def seed_state():
+    """Primeira execução: usa a cópia mais recente já salva como referência."""
+    if state_file.exists():
+        return
+    copies = sorted(folder.glob("*.xlsx"), key=lambda p: p.stat().st_mtime)
+    if copies:
+        last = copies[-1]
+        save_state(state_file, {"sha256": sha256_file(last), "file": last.name})
+
+
+def main():
     folder.mkdir(parents=True, exist_ok=True)  # Garante que a pasta existe
+    seed_state()
     filename = folder / f"{date.today().strftime('%d-%m-%Y')}.xlsx"
-    filename.write_bytes(resp.content)
-    print(f"Arquivo salvo como {filename}")
-else:
-    print("Falha ao baixar o arquivo")
+    saved = fetch_if_changed(url, filename, state_file)
+    if saved is not None:
+        print(f"Arquivo salvo como {saved}")
+    else:
+        last = load_state(state_file).get("file")
+        print(f"Planilha inalterada; última cópia: {last}")
+
+
+if __name__ == "__main__":
+    main()
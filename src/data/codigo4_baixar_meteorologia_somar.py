@@ -1,63 +1,333 @@
+import argparse
+import itertools
+import os
+import shutil
+import tempfile
+import time
+import unicodedata
 from datetime import date
 from pathlib import Path
 
-url = "https://somarmeteorologia.com.br/v3/excel/po_graf_pont.php?cid=BarradoChoca-BA,Ibicoara-BA,Itabela-BA,VitoriadaConquista-BA,AfonsoClaudio-ES,Alegre-ES,Brejetuba-ES,CachoeirodeItapemirim-ES,Colatina-ES,Iuna-ES,Jaguare-ES,Linhares-ES,MunizFreire-ES,NovaVenecia-ES,RioBananal-ES,SaoGabrieldaPalha-ES,VargemAlta-ES,Alfenas-MG,Araguari-MG,BoaEsperanca-MG,CaboVerde-MG,CamposAltos-MG,CamposGerais-MG,Caratinga-MG,CarmodoParanaiba-MG,Coromandel-MG,EsperaFeliz-MG,Guaxupe-MG,Lajinha-MG,Lambari-MG,Lavras-MG,Machado-MG,Manhuacu-MG,Matipo-MG,MonteCarmelo-MG,Nepomuceno-MG,NovaResende-MG,PatosdeMinas-MG,Patrocinio-MG,PocosdeCaldas-MG,SantaMargarida-MG,SantoAntoniodoAmparo-MG,SaoGotardo-MG,SaoSebastiaodoParaiso-MG,TresPontas-MG,Varginha-MG,Apucarana-PR,Jacarezinho-PR,Londrina-PR,NovaFatima-PR,Ariquemes-RO,Cacoal-RO,Altinopolis-SP,EspiritoSantodoPinhal-SP,Franca-SP,Garca-SP,Mococa-SP,Pedregulho-SP&ano=2025&mes=8"
+import pandas as pd
+import requests
 
-# --- Download com Selenium ---
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import time
-import shutil
+import somar_store
+from concurrency import env_float, env_int, map_ordered
 
-# Configurar pasta de download
-download_dir = str(Path.cwd())
-chrome_options = Options()
-chrome_options.add_experimental_option(
-    "prefs",
-    {
-        "download.default_directory": download_dir,
-        "download.prompt_for_download": False,
-        "download.directory_upgrade": True,
-        "safebrowsing.enabled": True,
-    },
-)
-chrome_options.add_argument(
-    "--headless=new"
-)  # Remova esta linha se quiser ver o navegador
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-
-driver = webdriver.Chrome(
-    service=Service(ChromeDriverManager().install()), options=chrome_options
-)
-driver.get(url)
-
-# Espera o download (ajuste o tempo se necessário)
-time.sleep(15)
-
-# Renomeia o arquivo baixado
-files = list(Path(download_dir).glob("*.xls*"))
-if files:
-    novo_nome = f"dados_meteorologicos_{date.today().isoformat()}.xls"
-    shutil.move(str(files[0]), novo_nome)
-    print(f"Arquivo salvo como {novo_nome}")
-else:
-    print("Falha ao baixar o arquivo com Selenium")
-
-driver.quit()
-
-# --- Fallback: requests (pode não funcionar devido a SSL) ---
-import requests
+SOMAR_URL = "https://somarmeteorologia.com.br/v3/excel/po_graf_pont.php"
+
+# cidades padrão (ids SOMAR: nome sem acento/espaço + "-UF")
+CITIES = [
+    "BarradoChoca-BA",
+    "Ibicoara-BA",
+    "Itabela-BA",
+    "VitoriadaConquista-BA",
+    "AfonsoClaudio-ES",
+    "Alegre-ES",
+    "Brejetuba-ES",
+    "CachoeirodeItapemirim-ES",
+    "Colatina-ES",
+    "Iuna-ES",
+    "Jaguare-ES",
+    "Linhares-ES",
+    "MunizFreire-ES",
+    "NovaVenecia-ES",
+    "RioBananal-ES",
+    "SaoGabrieldaPalha-ES",
+    "VargemAlta-ES",
+    "Alfenas-MG",
+    "Araguari-MG",
+    "BoaEsperanca-MG",
+    "CaboVerde-MG",
+    "CamposAltos-MG",
+    "CamposGerais-MG",
+    "Caratinga-MG",
+    "CarmodoParanaiba-MG",
+    "Coromandel-MG",
+    "EsperaFeliz-MG",
+    "Guaxupe-MG",
+    "Lajinha-MG",
+    "Lambari-MG",
+    "Lavras-MG",
+    "Machado-MG",
+    "Manhuacu-MG",
+    "Matipo-MG",
+    "MonteCarmelo-MG",
+    "Nepomuceno-MG",
+    "NovaResende-MG",
+    "PatosdeMinas-MG",
+    "Patrocinio-MG",
+    "PocosdeCaldas-MG",
+    "SantaMargarida-MG",
+    "SantoAntoniodoAmparo-MG",
+    "SaoGotardo-MG",
+    "SaoSebastiaodoParaiso-MG",
+    "TresPontas-MG",
+    "Varginha-MG",
+    "Apucarana-PR",
+    "Jacarezinho-PR",
+    "Londrina-PR",
+    "NovaFatima-PR",
+    "Ariquemes-RO",
+    "Cacoal-RO",
+    "Altinopolis-SP",
+    "EspiritoSantodoPinhal-SP",
+    "Franca-SP",
+    "Garca-SP",
+    "Mococa-SP",
+    "Pedregulho-SP",
+]
+
+INPUT_XLSX = "data/raw/Brazil Tracking Municipalities.xlsx"
+
+# backfill: cidades por requisição e downloads simultâneos na SOMAR
+CHUNK_CITIES = env_int("SOMAR_CHUNK_CITIES", 20)
+MAX_WORKERS = env_int("SOMAR_MAX_WORKERS", 3)
+
+# tempo máximo para o Chrome terminar o download (s)
+DOWNLOAD_TIMEOUT = env_float("SOMAR_DOWNLOAD_TIMEOUT", 120.0)
+
+# arquivos que o Chrome ainda está escrevendo
+PARTIAL_SUFFIXES = (".crdownload", ".tmp", ".part")
+
+
+def build_url(cities, year: int, month: int) -> str:
+    return f"{SOMAR_URL}?cid={','.join(cities)}&ano={year}&mes={month}"
+
+
+def somar_id(name: str, uf: str) -> str:
+    """Ex.: "São Gabriel da Palha", "ES" -> "SaoGabrieldaPalha-ES"."""
+    plain = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    words = [
+        w.lower() if w.lower() in ("de", "da", "do", "das", "dos") else w
+        for w in plain.split()
+    ]
+    return "".join(words) + f"-{str(uf).strip().upper()}"
+
+
+def cities_from_sheet(path=INPUT_XLSX) -> list | None:
+    """Ids SOMAR da planilha de municípios, se ela tiver a coluna de UF."""
+    df = pd.read_excel(path)
+    uf_col = next(
+        (c for c in df.columns if str(c).strip().upper() in ("UF", "ESTADO")), None
+    )
+    if uf_col is None:
+        print(f"[WARN] {path} sem coluna UF/Estado: usando as cidades padrão.")
+        return None
+    rows = df[["Stn Name", uf_col]].dropna()
+    ids = (somar_id(name, uf) for name, uf in rows.itertuples(index=False))
+    return list(dict.fromkeys(ids))
+
+
+def month_range(first: str, last: str) -> list:
+    """Ex.: "2025-01", "2025-03" -> [(2025, 1), (2025, 2), (2025, 3)]."""
+    periods = pd.period_range(first, last, freq="M")
+    return [(p.year, p.month) for p in periods]
 
-try:
-    response = requests.get(url, timeout=720, verify=False)
-    if response.status_code == 200:
-        filename = f"dados_meteorologicos_{date.today().isoformat()}.xls"
-        Path(filename).write_bytes(response.content)
-        print(f"Arquivo salvo como {filename}")
+
+def looks_like_sheet(resp: requests.Response, head: bytes) -> bool:
+    """Planilha (xls/xlsx ou tabela HTML servida como Excel), não página de erro."""
+    if head.startswith((b"\xd0\xcf\x11\xe0", b"PK\x03\x04")):
+        return True
+    ctype = resp.headers.get("Content-Type", "").lower()
+    disposition = resp.headers.get("Content-Disposition", "").lower()
+    return "excel" in ctype or "spreadsheet" in ctype or "attachment" in disposition
+
+
+# =========================
+# 1) Caminho direto: requests
+# =========================
+def download_requests(url: str, dest: Path, timeout=(15, 300)) -> bool:
+    import urllib3
+
+    # o certificado da SOMAR costuma falhar na validação (mesmo verify=False de antes)
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    tmp = dest.with_name(dest.name + ".part")
+    try:
+        with requests.get(url, stream=True, timeout=timeout, verify=False) as resp:
+            if resp.status_code != 200:
+                print(f"[WARN] SOMAR via requests: status {resp.status_code}")
+                return False
+            chunks = resp.iter_content(1 << 16)
+            head = next(chunks, b"")
+            if not looks_like_sheet(resp, head):
+                print("[WARN] SOMAR via requests: resposta não é planilha")
+                return False
+            with open(tmp, "wb") as f:
+                f.write(head)
+                for chunk in chunks:
+                    f.write(chunk)
+    except requests.RequestException as e:
+        print(f"[WARN] SOMAR via requests: {e}")
+        tmp.unlink(missing_ok=True)
+        return False
+    os.replace(tmp, dest)
+    return True
+
+
+# =========================
+# 2) Fallback: Selenium, esperando o arquivo aparecer na pasta de download
+# =========================
+def wait_for_download(folder: Path, timeout: float, poll: float = 0.25) -> Path:
+    """Primeiro arquivo concluído (sem .crdownload) com tamanho estável."""
+    deadline = time.monotonic() + timeout
+    sizes = {}
+    while time.monotonic() < deadline:
+        files = list(folder.iterdir())
+        if files and not any(p.name.endswith(PARTIAL_SUFFIXES) for p in files):
+            for p in files:
+                size = p.stat().st_size
+                # mesmo tamanho em duas leituras seguidas: o Chrome terminou de gravar
+                if size > 0 and sizes.get(p) == size:
+                    return p
+                sizes[p] = size
+        time.sleep(poll)
+    raise TimeoutError(f"download não terminou em {timeout:.0f}s")
+
+
+def download_selenium(url: str, dest: Path, timeout: float = DOWNLOAD_TIMEOUT) -> bool:
+    from selenium import webdriver
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    # pasta temporária própria: nada antigo no diretório de trabalho é confundido
+    with tempfile.TemporaryDirectory(prefix="somar_") as download_dir:
+        chrome_options = Options()
+        chrome_options.add_experimental_option(
+            "prefs",
+            {
+                "download.default_directory": download_dir,
+                "download.prompt_for_download": False,
+                "download.directory_upgrade": True,
+                "safebrowsing.enabled": True,
+            },
+        )
+        chrome_options.add_argument(
+            "--headless=new"
+        )  # Remova esta linha se quiser ver o navegador
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+
+        try:
+            driver = webdriver.Chrome(
+                service=Service(ChromeDriverManager().install()), options=chrome_options
+            )
+        except (WebDriverException, requests.RequestException, OSError) as e:
+            # Chrome/driver ausente ou sem rede para baixar o driver
+            print(f"[ERRO] SOMAR via Selenium: navegador não abriu ({e})")
+            return False
+        try:
+            driver.get(url)
+            downloaded = wait_for_download(Path(download_dir), timeout)
+        except (TimeoutError, WebDriverException) as e:
+            print(f"[ERRO] SOMAR via Selenium: {e}")
+            return False
+        finally:
+            driver.quit()
+        shutil.move(str(downloaded), dest)
+    return True
+
+
+# =========================
+# 3) Backfill: meses x lotes de cidades, em paralelo, num histórico por mês
+# =========================
+def fetch_chunk(task, folder: Path, browser: bool = False):
+    year, month, n, cities = task
+    dest = folder / f"{year}-{month:02d}_{n:03d}.xls"
+    url_chunk = build_url(cities, year, month)
+    download = download_selenium if browser else download_requests
+    if not download(url_chunk, dest):
+        return None
+    try:
+        df = somar_store.read_sheet(dest)
+    except (ValueError, ImportError) as e:
+        print(f"[ERRO] SOMAR {year}-{month:02d} lote {n}: planilha ilegível ({e})")
+        return None
+    return df.assign(ano=year, mes=month)
+
+
+def backfill(months, cities=CITIES, chunk: int = CHUNK_CITIES) -> list:
+    """Baixa e grava os meses completos; devolve os lotes sem dados (ano, mês, lote)."""
+    tasks = [
+        (year, month, n, cities[i : i + chunk])
+        for year, month in months
+        for n, i in enumerate(range(0, len(cities), chunk))
+    ]
+    print(f"[INFO] SOMAR: {len(months)} meses x {len(cities)} cidades, {len(tasks)} lotes")
+    failed = []
+    browser = True
+    with tempfile.TemporaryDirectory(prefix="somar_backfill_") as tmp:
+        folder = Path(tmp)
+        frames = map_ordered(lambda t: fetch_chunk(t, folder), tasks, MAX_WORKERS)
+        # cada mês é gravado assim que seus lotes terminam; os que já vieram
+        # completos via requests saem antes de qualquer fallback no navegador
+        by_month = [
+            (ym, list(ks))
+            for ym, ks in itertools.groupby(range(len(tasks)), lambda k: tasks[k][:2])
+        ]
+        by_month.sort(key=lambda item: any(frames[k] is None for k in item[1]))
+        for (year, month), ks in by_month:
+            parts = []
+            for k in ks:
+                if frames[k] is None and browser:
+                    # lote que falhou via requests: navegador, um por vez
+                    try:
+                        frames[k] = fetch_chunk(tasks[k], folder, browser=True)
+                    except ImportError as e:
+                        print(f"[WARN] SOMAR: sem Selenium para o fallback ({e})")
+                        browser = False
+                if frames[k] is None:
+                    n = tasks[k][2]
+                    print(f"[ERRO] SOMAR {year}-{month:02d} lote {n}: sem dados")
+                    failed.append((year, month, n))
+                    continue
+                parts.append(frames[k])
+                frames[k] = None  # já está em `parts`
+            if len(parts) < len(ks):
+                # gravar só parte das cidades substituiria a partição inteira e
+                # apagaria as que já estavam certas: o mês fica como estava
+                print(f"[ERRO] SOMAR {year}-{month:02d}: incompleto, não gravado")
+                continue
+            if parts:
+                df = pd.concat(parts, ignore_index=True)
+                somar_store.write_month(year, month, df)
+                print(f"[OK] SOMAR {year}-{month:02d}: {len(df)} linhas")
+    return failed
+
+
+def main():
+    today = date.today()
+    url = build_url(CITIES, today.year, today.month)
+    dest = Path(f"dados_meteorologicos_{today.isoformat()}.xls")
+    # navegador só se o download direto falhar
+    if download_requests(url, dest) or download_selenium(url, dest):
+        print(f"Arquivo salvo como {dest}")
     else:
         print("Falha ao baixar o arquivo")
-except Exception as e:
-    print(f"Erro ao tentar baixar o arquivo: {e}")
+
+
+if __name__ == "__main__":
+    # sem argumentos: download do mês corrente (uso diário / pipeline)
+    #   python codigo4_baixar_meteorologia_somar.py --months 2024-09:2025-08 --sheet
+    parser = argparse.ArgumentParser(description="Exportação SOMAR")
+    parser.add_argument("--months", help="intervalo AAAA-MM:AAAA-MM para backfill")
+    parser.add_argument("--cities", help="ids SOMAR separados por vírgula")
+    parser.add_argument(
+        "--sheet", action="store_true", help="cidades da planilha de municípios"
+    )
+    args = parser.parse_args()
+    if args.months:
+        first, _, last = args.months.partition(":")
+        if args.cities:
+            cities = args.cities.split(",")
+        else:
+            cities = (cities_from_sheet() if args.sheet else None) or CITIES
+        failed = backfill(month_range(first, last or first), cities)
+        if failed:
+            # meses completos já foram gravados; os incompletos mantêm a partição
+            # anterior até uma reexecução trazer todos os lotes
+            raise SystemExit(f"[ERRO] SOMAR: {len(failed)} lotes sem dados")
+    else:
+        main()
@@ -1,62 +1,178 @@
 # -*- coding: utf-8 -*-
 # Código 5: Scraping de Dados de Vento (equivalente em Python)
+# Backfill por estação e intervalo de datas: uma página mensal por (estação, mês),
+# baixadas em paralelo com limite de taxa, tabela lida uma única vez e gravada no
+# histórico por estação (wunderground_store.py). Meses já completos são pulados.
+# Colunas com unidade ("5 mph", "75 °F") saem como float32 métrico (m/s, °C, hPa, mm).
+#
+#   python codigo5_scraping_ventos_wunderground.py                      -> mês atual
+#   python codigo5_scraping_ventos_wunderground.py --start 2024-06-01 --end 2024-08-31
+
+import argparse
+import io
+from datetime import date, timedelta
+from pathlib import Path
 
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
-from pathlib import Path
+
+import wunderground_store
+from concurrency import HostRateLimiter, env_float, env_int, map_ordered
 
 save_directory = Path(
     r"C:/Users/vinicius.pereira/OneDrive - ED & F Man Holding Limited/Clima/Daily/Winds"
 )
-save_directory.mkdir(parents=True, exist_ok=True)
 
+STATIONS = ["ISOMAT4", "IRIOBA4", "ILINHA1", "IARACR4", "ISANTO362"]
+
+PAGE_URL = (
+    "https://www.wunderground.com/dashboard/pws/{station}/table/{day}/{day}/monthly"
+)
+
+# páginas simultâneas e ritmo máximo no wunderground.com
+MAX_WORKERS = env_int("WU_MAX_WORKERS", 4)
+RATE_LIMITER = HostRateLimiter(env_float("WU_MAX_PER_SECOND", 1.0))
+
+_session = requests.Session()
 
-def scrape_and_save(url: str, output_file: str):
-    r = requests.get(url, timeout=120)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "lxml")
-    node = soup.select_one(".history-table.desktop-table")
+
+def month_starts(start: date, end: date) -> list:
+    first = start.replace(day=1)
+    return [d.date() for d in pd.date_range(first, end, freq="MS")]
+
+
+def missing_months(station: str, start: date, end: date) -> list:
+    """Meses do intervalo com alguma data ainda fora do histórico."""
+    today = date.today()
+    todo = []
+    for month in month_starts(start, end):
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        if month <= today < next_month:
+            todo.append(month)  # mês corrente: o dia de hoje ainda muda
+            continue
+        # baixado depois do fim do mês: a página já estava completa (dias sem
+        # dado na estação não fazem o mês ser baixado de novo)
+        fetched = wunderground_store.fetched_on(station, month.year, month.month)
+        if fetched is not None and fetched >= next_month:
+            continue
+        lo, hi = max(month, start), min(next_month - timedelta(days=1), end)
+        wanted = {lo + timedelta(days=i) for i in range((hi - lo).days + 1)}
+        stored = wunderground_store.stored_dates(station, month.year, month.month)
+        if not wanted <= stored:
+            todo.append(month)
+    return todo
+
+
+def flatten_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # cabeçalho em dois níveis ("Temperature" / "High") -> "Temperature High"
+    if isinstance(df.columns, pd.MultiIndex):
+        names = []
+        for parts in df.columns:
+            kept = [str(p) for p in parts if not str(p).startswith("Unnamed")]
+            names.append(" ".join(dict.fromkeys(kept)))
+        df.columns = names
+    return df
+
+
+def parse_history(html: str) -> pd.DataFrame:
+    """Tabela do histórico: o nó é achado com o seletor CSS e lido uma vez."""
+    # seletor CSS: as duas classes em qualquer ordem, mesmo com outras junto
+    node = BeautifulSoup(html, "lxml").select_one(".history-table.desktop-table")
     if node is None:
         raise ValueError("Tabela não encontrada na página.")
-    tables = pd.read_html(str(node))
-    if not tables:
-        raise ValueError("Falha ao ler tabela.")
-    df = tables[0]
-    if isinstance(df, pd.Series):
-        df = df.map(
-            lambda x: str(x).replace("Â", "").replace("Ã", "")
-            if isinstance(x, str)
-            else x
-        )
-    else:
-        df = df.apply(
-            lambda x: str(x).replace("Â", "").replace("Ã", "")
-            if isinstance(x, str)
-            else x
-        )
-    output_path = save_directory / output_file
-    df.to_csv(output_path, index=False, encoding="utf-8")
-    print(f"Salvo: {output_path}")
-
-
-urls = [
-    "https://www.wunderground.com/dashboard/pws/ISOMAT4/table/2024-08-31/2024-08-31/monthly",
-    "https://www.wunderground.com/dashboard/pws/IRIOBA4/table/2024-08-31/2024-08-31/monthly",
-    "https://www.wunderground.com/dashboard/pws/ILINHA1/table/2024-08-31/2024-08-31/monthly",
-    "https://www.wunderground.com/dashboard/pws/IARACR4/table/2024-08-31/2024-08-31/monthly",
-    "https://www.wunderground.com/dashboard/pws/ISANTO362/table/2024-08-31/2024-08-31/monthly",
-]
-
-output_files = [
-    "ISOMAT4_Aug_2024.csv",
-    "IRIOBA4_Aug_2024.csv",
-    "ILINHA1_Aug_2024.csv",
-    "IARACR4_Aug_2024.csv",
-    "ISANTO362_Aug_2024.csv",
-]
-
-for u, f in zip(urls, output_files):
-    scrape_and_save(u, f)
-
-print("Dados foram salvos em arquivos CSV com sucesso!")
+    df = flatten_columns(pd.read_html(io.StringIO(str(node)))[0])
+    df = df.rename(columns={df.columns[0]: "date"})
+    df["date"] = pd.to_datetime(df["date"], format="%m/%d/%Y", errors="coerce")
+    return df.dropna(subset=["date"]).reset_index(drop=True)
+
+
+# unidade do site -> (fator, soma, sufixo métrico); valor = (x + soma) * fator
+UNITS = {
+    "°F": (5 / 9, -32.0, "c"),
+    "°C": (1.0, 0.0, "c"),
+    "mph": (0.44704, 0.0, "ms"),
+    "km/h": (1 / 3.6, 0.0, "ms"),
+    "m/s": (1.0, 0.0, "ms"),
+    "in_pressure": (33.8639, 0.0, "hpa"),
+    "in_precip": (25.4, 0.0, "mm"),
+    "hPa": (1.0, 0.0, "hpa"),
+    "mm": (1.0, 0.0, "mm"),
+    "%": (1.0, 0.0, "pct"),
+}
+
+_NUMBER = r"(-?\d+(?:\.\d+)?)"
+
+
+def snake(name: str) -> str:
+    return "_".join(name.lower().replace(".", " ").split())
+
+
+def normalize_units(df: pd.DataFrame) -> pd.DataFrame:
+    """Ex.: "5 mph", "75 °F", "29.9 in" -> float32 métrico (m/s, °C, hPa, mm)."""
+    out = {"date": df["date"]}
+    for col in df.columns.drop("date"):
+        text = df[col].astype(str).str.strip()  # NaN vira "nan": sem número
+        values = pd.to_numeric(text.str.extract(_NUMBER)[0], errors="coerce")
+        units = text.str.extract(_NUMBER + r"\s*(\S+)$")[1].dropna()
+        unit = units.mode().iloc[0] if len(units) else None
+        if unit == "in":
+            unit = "in_precip" if "precip" in col.lower() else "in_pressure"
+        factor, shift, suffix = UNITS.get(unit, (1.0, 0.0, None))
+        name = snake(col) + (f"_{suffix}" if suffix else "")
+        out[name] = ((values + shift) * factor).astype("float32")
+    return pd.DataFrame(out)
+
+
+def fetch_month(task):
+    station, month = task
+    url = PAGE_URL.format(station=station, day=month.isoformat())
+    RATE_LIMITER.wait(url)
+    try:
+        r = _session.get(url, timeout=120)
+        r.raise_for_status()
+        # a página é UTF-8; sem charset no cabeçalho o requests cai em latin-1 e
+        # "°F" vira "Â°F", então decodifica explicitamente
+        html = r.content.decode("utf-8", errors="replace")
+        return normalize_units(parse_history(html))
+    except (requests.RequestException, ValueError) as e:
+        # ValueError: read_html não achou a tabela
+        print(f"[ERRO] {station} {month:%Y-%m}: {e}")
+        return None
+
+
+def backfill(stations, start: date, end: date, export_csv: bool = True):
+    tasks = [(s, m) for s in stations for m in missing_months(s, start, end)]
+    print(f"[INFO] Wunderground: {len(tasks)} páginas (estação, mês) a baixar")
+    frames = map_ordered(fetch_month, tasks, MAX_WORKERS)
+    for (station, month), df in zip(tasks, frames):
+        if df is None:
+            continue
+        wunderground_store.write_month(station, month.year, month.month, df)
+        if export_csv:
+            # mesmo CSV de antes por estação e mês (ex.: ISOMAT4_Aug_2024.csv)
+            output_path = save_directory / f"{station}_{month:%b_%Y}.csv"
+            df.to_csv(output_path, index=False, encoding="utf-8")
+        print(f"Salvo: {station} {month:%Y-%m} ({len(df)} dias)")
+
+
+def main(stations=STATIONS, start: date | None = None, end: date | None = None):
+    save_directory.mkdir(parents=True, exist_ok=True)
+    end = end or date.today()
+    start = start or end.replace(day=1)
+    backfill(stations, start, end)
+
+    print("Dados foram salvos em arquivos CSV com sucesso!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill Weather Underground")
+    parser.add_argument("--stations", help="IDs PWS separados por vírgula")
+    parser.add_argument("--start", type=date.fromisoformat, help="AAAA-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="AAAA-MM-DD")
+    args = parser.parse_args()
+    main(
+        args.stations.split(",") if args.stations else STATIONS,
+        args.start,
+        args.end,
+    )
@@ -1,97 +1,126 @@
 # -*- coding: utf-8 -*-
 # Código 6: Web Scraping de Indicadores de Café + NOAA VHI + USD/BRL (equivalente em Python)
 
-import io
-import re
-import requests
+import os
+
 import pandas as pd
 from pathlib import Path
 from datetime import date
-import yfinance as yf
+
+import cepea_store
+import market_store
+import noaa_vhi_store
+from br_numbers import parse_br_columns
 
 # -------- CEPEA --------
 url_cepea = "https://www.cepea.esalq.usp.br/br/indicador/cafe.aspx"
-tables = pd.read_html(url_cepea, flavor="lxml")
 
-cafe_arabica = tables[0].copy()
-cafe_robusta = tables[1].copy()
+output_dir = Path(
+    r"C:/Users/vinicius.pereira/OneDrive - ED & F Man Holding Limited/Brazil Diffs - Documents/BaseCepea"
+)
 
 
 def convert_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-
-    def br_to_float(s):
-        s = str(s)
-        s = s.replace(".", "").replace("%", "").replace(",", ".")
-        try:
-            return float(s)
-        except ValueError:
-            return pd.NA
-
-    if "Valor R$" in df.columns:
-        df["Valor R$"] = df["Valor R$"].map(br_to_float)
-    if "Valor US$" in df.columns:
-        df["Valor US$"] = df["Valor US$"].map(br_to_float)
-    if "Var./Dia" in df.columns:
-        df["Var./Dia"] = df["Var./Dia"].map(br_to_float) / 100.0
-    if "Var./Mês" in df.columns:
-        df["Var./Mês"] = df["Var./Mês"].map(br_to_float) / 100.0
-    return df
-
-
-cafe_arabica = convert_columns(cafe_arabica)
-cafe_robusta = convert_columns(cafe_robusta)
+    return parse_br_columns(
+        df, numbers=["Valor R$", "Valor US$"], percents=["Var./Dia", "Var./Mês"]
+    )
 
-output_dir = Path(
-    r"C:/Users/vinicius.pereira/OneDrive - ED & F Man Holding Limited/Brazil Diffs - Documents/BaseCepea"
-)
-output_dir.mkdir(parents=True, exist_ok=True)
 
-output_file_arabica = output_dir / f"Arabica_{date.today().isoformat()}.csv"
-output_file_robusta = output_dir / f"Conilon_{date.today().isoformat()}.csv"
+def cepea():
+    # thousands/decimal no formato BR: números sem % já chegam como float
+    tables = pd.read_html(url_cepea, flavor="lxml", thousands=".", decimal=",")
+
+    cafe_arabica = convert_columns(tables[0].copy())
+    cafe_robusta = convert_columns(tables[1].copy())
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    output_file_arabica = output_dir / f"Arabica_{date.today().isoformat()}.csv"
+    output_file_robusta = output_dir / f"Conilon_{date.today().isoformat()}.csv"
+
+    cafe_arabica.to_csv(output_file_arabica, index=False, encoding="utf-8")
+    cafe_robusta.to_csv(output_file_robusta, index=False, encoding="utf-8")
+    print("Dados do CEPEA foram salvos em arquivos CSV com sucesso!")
+
+    # histórico único por produto; na primeira vez, importa os CSVs datados
+    for product, table in (("Arabica", cafe_arabica), ("Conilon", cafe_robusta)):
+        if not cepea_store.store_path(product).exists():
+            cepea_store.ingest_dated_csvs(product, output_dir, product)
+        added = cepea_store.upsert(product, [table])
+        print(f"Histórico CEPEA {product}: {added} datas novas")
 
-cafe_arabica.to_csv(output_file_arabica, index=False, encoding="utf-8")
-cafe_robusta.to_csv(output_file_robusta, index=False, encoding="utf-8")
-print("Dados do CEPEA foram salvos em arquivos CSV com sucesso!")
 
 # -------- NOAA VHI --------
-url_noaa = (
-    "https://www.star.nesdis.noaa.gov/smcd/emb/vci/VH/get_TS_admin.php"
-    "?provinceID=13&country=BRA&yearlyTag=Weekly&type=Parea_VHI&TagCropland=ACOF&year1=1982&year2=2024"
-)
+# série por estado, incremental (noaa_vhi_store.py): só os anos desde a última semana
+def noaa_vhi():
+    series = noaa_vhi_store.update_all()
+    for region, df in series.items():
+        print(f"--- {region} ---")
+        print(df.tail())
 
-resp = requests.get(url_noaa, timeout=120)
-if resp.status_code == 200:
-    text = resp.text
-    lines = text.splitlines()
-    # encontra primeira linha de dados que começa com ano (ex: 1982)
-    start_idx = next(
-        (i for i, ln in enumerate(lines) if re.match(r"^\s*1982", ln)), None
-    )
-    if start_idx is not None:
-        data_lines = lines[start_idx:]
-        data_csv = "\n".join(data_lines)
-        df_noaa = pd.read_csv(io.StringIO(data_csv), header=None)
-        print(df_noaa.head())
-    else:
-        print("Dados NOAA: início não encontrado.")
-else:
-    print(f"Erro NOAA: Status {resp.status_code}")
 
 # -------- USD/BRL Yahoo Finance --------
+# histórico local incremental (market_store.py) para todos os símbolos de
+# market_store.SYMBOLS; o CSV do dólar segue existindo para quem já o consome
 symbol = "BRL=X"  # USD/BRL
-start_date = "2020-01-01"
-end_date = None  # até hoje
 
-hist = yf.download(symbol, start=start_date, end=end_date, progress=False)
-if hist is not None and not hist.empty:
-    hist = hist.reset_index().rename(columns=str)
-    hist.columns = ["date"] + [c for c in hist.columns if c != "date"]
+caminho_dolar = Path(
+    r"C:/Users/vinicius.pereira/OneDrive - ED & F Man Holding Limited/Brazil Diffs - Documents/cotacoes_dolar.csv"
+)
+
 
-    caminho = Path(
-        r"C:/Users/vinicius.pereira/OneDrive - ED & F Man Holding Limited/Brazil Diffs - Documents/cotacoes_dolar.csv"
+def drop_last_row(path: Path, day) -> bool:
+    """Tira a última linha do CSV se ela for do dia `day` (False se não for)."""
+    with open(path, "rb+") as f:
+        offset = max(0, f.seek(0, os.SEEK_END) - 4096)
+        f.seek(offset)
+        tail = f.read().rstrip(b"\r\n")
+        if b"\n" not in tail:
+            return False
+        start = tail.rfind(b"\n") + 1
+        if not tail[start:].startswith(day.strftime("%Y-%m-%d").encode()):
+            return False
+        f.truncate(offset + start)
+    return True
+
+
+def export_dolar(previous_last):
+    """Regrava no CSV do dólar só a partir do último dia exportado (a barra dele
+    pode ter mudado); reescreve tudo se o formato mudou."""
+    columns = ["date"] + market_store.FIELDS
+    same_layout = caminho_dolar.exists() and (
+        pd.read_csv(caminho_dolar, nrows=0).columns.tolist() == columns
     )
-    hist.to_csv(caminho, index=False, encoding="utf-8")
-    print(f"Arquivo 'cotacoes_dolar.csv' salvo com sucesso em: {caminho}")
-else:
-    print("Erro: Não foi possível baixar dados USD/BRL do Yahoo Finance.")
+    if (
+        same_layout
+        and previous_last is not None
+        and drop_last_row(caminho_dolar, previous_last)
+    ):
+        rows = market_store.load(symbol, since=previous_last)
+        rows[columns].to_csv(
+            caminho_dolar, mode="a", header=False, index=False, encoding="utf-8"
+        )
+    else:
+        rows = market_store.load(symbol)
+        rows[columns].to_csv(caminho_dolar, index=False, encoding="utf-8")
+    print(f"'cotacoes_dolar.csv' atualizado (+{len(rows)} linhas): {caminho_dolar}")
+
+
+def usd_brl():
+    previous_last = market_store.last_date(symbol)
+    market_store.update()
+    if market_store.last_date(symbol) is None:
+        print("Erro: Não foi possível baixar dados USD/BRL do Yahoo Finance.")
+        return
+    # mesmo sem datas novas, a barra do último dia pode ter sido revista
+    export_dolar(previous_last)
+
+
+def main():
+    cepea()
+    noaa_vhi()
+    usd_brl()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,19 @@
 # VHI downloader with robust week fallback per year (fixes Rondônia/2024 gaps)
 import os
 import time
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 from PIL import Image, UnidentifiedImageError
 from io import BytesIO
 from datetime import datetime
 from zoneinfo import ZoneInfo  # Python 3.9+
 
+from concurrency import env_int, map_ordered
+from vhi_cache import VhiImageCache, WeekIndex
+from vhi_compose import build_layouts, save_png
+from vhi_raster import RasterStore, decode_vhi, update_stats, vhi_stats
+
 
 # =========================
 # Configurações
@@ -33,7 +40,9 @@ def get_max_lookback() -> int:
 
 # Saída
 output_dir = "vhi_images"
-os.makedirs(output_dir, exist_ok=True)
+
+# Máx. de downloads simultâneos (região, ano) em star.nesdis.noaa.gov
+MAX_WORKERS = env_int("VHI_MAX_WORKERS", 4)
 
 # =========================
 # URLs por região (placeholders: {year}, {week})
@@ -74,6 +83,25 @@ regions = {
 # ordem: primeiro é o “ano mais recente” (aplica fallback de ANO só nele)
 years = [2025, 2024, 2023, 2022]
 
+# Figuras combinadas (nomes FIXOS, usados no e-mail), montadas em memória na ordem:
+#  - por região: anos lado a lado, crescentes da esquerda para a direita;
+#  - verticais: uma figura combinada acima da outra.
+# Peça (região, ano) = imagem baixada; peça "arquivo.png" = figura montada antes.
+LAYOUTS = {
+    **{
+        f"{region}_combined.png": ("h", [(region, yr) for yr in reversed(years)])
+        for region in regions
+    },
+    "combined_Minas_Gerais_Sao_Paulo.png": (
+        "v",
+        ["Minas_Gerais_combined.png", "Sao_Paulo_combined.png"],
+    ),
+    "combined_Rondonia_Espirito_Santo.png": (
+        "v",
+        ["Rondonia_combined.png", "Espirito_Santo_combined.png"],
+    ),
+}
+
 # Cabeçalhos para evitar bloqueios ocasionais
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; VHI-Downloader/1.0; +https://www.star.nesdis.noaa.gov/)",
@@ -82,6 +110,18 @@ DEFAULT_HEADERS = {
 }
 
 
+def make_session(max_connections: int = MAX_WORKERS) -> requests.Session:
+    """Sessão única (keep-alive) para a NOAA; o pool limita as conexões abertas."""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    # pool_block: além do limite, a requisição espera uma conexão livre
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=max_connections, pool_block=True
+    )
+    session.mount("https://", adapter)
+    return session
+
+
 # =========================
 # Utilidades de imagem
 # =========================
@@ -99,71 +139,95 @@ def is_image_response(resp: requests.Response) -> bool:
         return False
 
 
-def has_no_data_banner(img: Image.Image) -> bool:
-    """Detecta o banner vermelho 'Sorry, data are not available!' (robusto a tamanhos)."""
+# vermelho “banner” (tolerante) e fração mínima de pixels por faixa
+BANNER_MIN_RED, BANNER_MAX_GB, BANNER_RATIO = 180, 100, 0.00025
+
+
+def banner_bands(img: Image.Image):
+    """Faixas de 12% superior e inferior (algumas figuras mudaram layout)."""
     w, h = img.size
-    # Examina 12% superiores e 12% inferiores (algumas figuras mudaram layout)
-    bands = [
-        img.crop((0, 0, w, max(1, int(h * 0.12)))).convert("RGB"),
-        img.crop((0, max(0, int(h * 0.88)), w, h)).convert("RGB"),
+    return [
+        img.crop((0, 0, w, max(1, int(h * 0.12)))),
+        img.crop((0, max(0, int(h * 0.88)), w, h)),
     ]
-    for band in bands:
-        red_pixels = 0
-        for r, g, b in band.getdata():
-            # vermelho “banner” (tolerante)
-            if r >= 180 and g <= 100 and b <= 100:
-                red_pixels += 1
-        ratio = red_pixels / max(1, band.size[0] * band.size[1])
-        if ratio > 0.00025:
-            return True
-    return False
 
 
-def combine_images_horizontally(images):
-    max_h = max(i.height for i in images)
-    total_w = sum(i.width for i in images)
-    canvas = Image.new("RGB", (total_w, max_h), (255, 255, 255))
-    x = 0
-    for im in images:
-        y = (max_h - im.height) // 2
-        canvas.paste(im, (x, y))
-        x += im.width
-    return canvas
+def red_mask(rgb: np.ndarray) -> np.ndarray:
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    return (r >= BANNER_MIN_RED) & (g <= BANNER_MAX_GB) & (b <= BANNER_MAX_GB)
 
 
-def combine_images_vertically(images):
-    max_w = max(i.width for i in images)
-    total_h = sum(i.height for i in images)
-    canvas = Image.new("RGB", (max_w, total_h), (255, 255, 255))
-    y = 0
-    for im in images:
-        x = (max_w - im.width) // 2
-        canvas.paste(im, (x, y))
-        y += im.height
-    return canvas
+def has_no_data_banner(img: Image.Image) -> bool:
+    """Detecta o banner vermelho 'Sorry, data are not available!' (robusto a tamanhos)."""
+    # PNG com paleta: classifica as ≤256 cores uma vez e indexa, sem converter p/ RGB
+    lut = None
+    if img.mode == "P" and "transparency" not in img.info:
+        palette = np.frombuffer(bytes(img.getpalette()), dtype=np.uint8)
+        lut = red_mask(palette[: len(palette) // 3 * 3].reshape(-1, 3))
+        lut = np.pad(lut, (0, 256 - len(lut)))
+    for band in banner_bands(img):
+        if lut is not None:
+            red_pixels = np.count_nonzero(lut[np.asarray(band)])
+        else:
+            red_pixels = np.count_nonzero(red_mask(np.asarray(band.convert("RGB"))))
+        ratio = red_pixels / max(1, band.size[0] * band.size[1])
+        if ratio > BANNER_RATIO:
+            return True
+    return False
 
 
 # =========================
 # Busca semana válida global (usa ano mais recente e Minas Gerais como referência)
 # =========================
-def find_available_week(start_week: int, max_lookback: int) -> int:
+def find_available_week(
+    start_week: int,
+    max_lookback: int,
+    session: requests.Session | None = None,
+    cache: VhiImageCache | None = None,
+    weeks: WeekIndex | None = None,
+) -> int:
+    http = session or requests
     region_ref = next(iter(regions))  # primeira região do dicionário
     year_ref = years[0]
     wk = start_week
     for _ in range(max_lookback + 1):
+        # índice de disponibilidade primeiro: semana já conhecida não gasta sonda
+        known = weeks.status(year_ref, wk) if weeks else None
+        if known is True:
+            print(f"[OK] Semana válida (índice): {wk}")
+            return wk
+        if known is False:
+            print(f"[INFO] Semana {wk} sem dados (índice).")
+            wk = wk - 1 if wk > 1 else 53
+            continue
+
         url = regions[region_ref].format(year=year_ref, week=wk)
         print(f"[TESTE] Semana {wk} (ref: {region_ref} {year_ref})")
-        try:
-            r = requests.get(url, timeout=30, headers=DEFAULT_HEADERS)
-            if is_image_response(r):
-                img = Image.open(BytesIO(r.content))
-                if not has_no_data_banner(img):
-                    print(f"[OK] Semana válida: {wk}")
-                    return wk
-                else:
-                    print(f"[INFO] Semana {wk} sem dados (banner).")
-        except requests.RequestException as e:
-            print(f"[WARN] Rede: {e}")
+        hit = cache.get(region_ref, year_ref, wk, url) if cache else None
+        if hit is not None:
+            if weeks:
+                weeks.record(year_ref, wk, not hit[1])
+            if not hit[1]:
+                print(f"[OK] Semana válida (cache): {wk}")
+                return wk
+            print(f"[INFO] Semana {wk} sem dados (banner, cache).")
+        else:
+            try:
+                r = http.get(url, timeout=30, headers=DEFAULT_HEADERS)
+                if is_image_response(r):
+                    img = Image.open(BytesIO(r.content))
+                    banner = has_no_data_banner(img)
+                    if cache:
+                        cache.put(region_ref, year_ref, wk, url, r.content, banner)
+                    if weeks:
+                        weeks.record(year_ref, wk, not banner)
+                    if not banner:
+                        print(f"[OK] Semana válida: {wk}")
+                        return wk
+                    else:
+                        print(f"[INFO] Semana {wk} sem dados (banner).")
+            except requests.RequestException as e:
+                print(f"[WARN] Rede: {e}")
         wk -= 1
         if wk < 1:
             wk = 53
@@ -177,8 +241,18 @@ def find_available_week(start_week: int, max_lookback: int) -> int:
 #  - Para anos anteriores: tenta (semana) e recua semanas dentro do MESMO ano.
 # =========================
 def download_image_with_fallback(
-    region: str, base_year: int, start_week: int, max_lookback_weeks: int
+    region: str,
+    base_year: int,
+    start_week: int,
+    max_lookback_weeks: int,
+    session: requests.Session | None = None,
+    cache: VhiImageCache | None = None,
+    weeks: WeekIndex | None = None,
 ):
+    http = session or requests
+    # só a região de referência marca semanas "sem dados" no índice (há lacunas
+    # por estado, ex.: Rondônia/2024); dados de qualquer região marcam "ok"
+    is_ref = region == next(iter(regions))
     idx = years.index(base_year)
     year_candidates = (
         years[idx:] if idx == 0 else [base_year]
@@ -187,9 +261,21 @@ def download_image_with_fallback(
         wk = start_week
         for step in range(max_lookback_weeks + 1):
             url = regions[region].format(year=yr, week=wk)
+
+            # semana de ano encerrado já vista: decide pelo cache, sem rede
+            hit = cache.get(region, yr, wk, url) if cache else None
+            if hit is not None:
+                content, banner = hit
+                if banner:
+                    print(f"[CACHE] {region} {yr} semana {wk}: sem dados (banner).")
+                    wk = wk - 1 if wk > 1 else 53
+                    continue
+                print(f"[CACHE] {region} - ano {yr} - semana {wk}")
+                return Image.open(BytesIO(content)), yr, wk
+
             print(f"Baixando {region} - ano {yr} - semana {wk} (tentativa {step + 1})")
             try:
-                r = requests.get(url, timeout=60, headers=DEFAULT_HEADERS)
+                r = http.get(url, timeout=60, headers=DEFAULT_HEADERS)
             except requests.RequestException as e:
                 print(f"[ERRO] Rede: {e}")
                 time.sleep(0.5)
@@ -212,7 +298,12 @@ def download_image_with_fallback(
                 wk = wk - 1 if wk > 1 else 53
                 continue
 
-            if has_no_data_banner(img):
+            banner = has_no_data_banner(img)
+            if cache:
+                cache.put(region, yr, wk, url, r.content, banner)
+            if weeks and (is_ref or not banner):
+                weeks.record(yr, wk, not banner)
+            if banner:
                 print(f"[INFO] {region} {yr} semana {wk}: sem dados (banner).")
                 wk = wk - 1 if wk > 1 else 53
                 continue
@@ -230,63 +321,86 @@ def download_image_with_fallback(
 
 
 # =========================
-# Execução principal
+# Rasters numéricos + estatísticas por estado (a partir das imagens baixadas)
 # =========================
-initial_week = get_initial_week()
-max_lookback = get_max_lookback()
-week = find_available_week(initial_week, max_lookback)
-print(f"[INFO] Semana usada (referência): {week}")
-
-# 1) Download por região/ano e combinação horizontal
-saved_weeks = {}  # para log por região
-for region_name in regions.keys():
-    imgs, used_years = [], []
-    used_weeks = []
-    for i, year in enumerate(years):
-        img, used_year, used_week = download_image_with_fallback(
-            region_name, year, week, max_lookback_weeks=max_lookback
-        )
-        if img is None:
-            print(f"[WARN] Ignorando {region_name} {year}")
+def rasterize(results: dict):
+    # o fallback de ano pode trazer o mesmo (ano, semana) duas vezes por região
+    images = {
+        (region, yr, wk): img
+        for (region, _), (img, yr, wk) in results.items()
+        if img is not None
+    }
+    store, rows = RasterStore(), []
+    for (region, yr, wk), img in images.items():
+        try:
+            raster = decode_vhi(img)
+        except ValueError as e:
+            print(f"[WARN] Raster {region} {yr}: {e}")
             continue
-        # nomes FIXOS (sem semana)
-        path = os.path.join(output_dir, f"{region_name}_{used_year}.png")
-        img.save(path)
-        imgs.append(img)
-        used_years.append(used_year)
-        used_weeks.append(used_week)
-
-    saved_weeks[region_name] = used_weeks
-
-    if imgs:
-        combo = combine_images_horizontally(
-            list(reversed(imgs))
-        )  # direita→esquerda anos crescentes
-        out = os.path.join(output_dir, f"{region_name}_combined.png")
-        combo.save(out)
-        print(
-            f"[OK] Combinada: {out} | anos usados (esq→dir): {list(reversed(used_years))} | semanas: {list(reversed(used_weeks))}"
+        store.save(region, yr, wk, raster)
+        rows.append({"region": region, "year": yr, "week": wk} | vhi_stats(raster))
+    update_stats(rows)
+    print(f"[OK] Rasters VHI: {len(rows)} | estatísticas em vhi_stats.csv")
+
+
+# =========================
+# Execução principal
+# =========================
+def main():
+    os.makedirs(output_dir, exist_ok=True)
+    initial_week = get_initial_week()
+    max_lookback = get_max_lookback()
+    session = make_session()
+    cache = VhiImageCache()
+    weeks = WeekIndex()
+    week = find_available_week(initial_week, max_lookback, session, cache, weeks)
+    print(f"[INFO] Semana usada (referência): {week}")
+
+    # 1) Downloads (região, ano) em paralelo; o fallback de cada par segue em ordem
+    tasks = [(region_name, year) for region_name in regions for year in years]
+    results = dict(
+        zip(
+            tasks,
+            map_ordered(
+                lambda t: download_image_with_fallback(
+                    t[0],
+                    t[1],
+                    week,
+                    max_lookback_weeks=max_lookback,
+                    session=session,
+                    cache=cache,
+                    weeks=weeks,
+                ),
+                tasks,
+                MAX_WORKERS,
+            ),
         )
-    else:
-        print(f"[WARN] Sem imagens válidas para {region_name}")
+    )
 
+    cache.save()
+    weeks.save()
+    rasterize(results)
+
+    # 2) Imagens por ano (nomes FIXOS, sem semana) e log dos anos/semanas usados
+    for region_name in regions:
+        used = []
+        for year in years:
+            img, used_year, used_week = results[(region_name, year)]
+            if img is None:
+                print(f"[WARN] Ignorando {region_name} {year}")
+                continue
+            save_png(img, os.path.join(output_dir, f"{region_name}_{used_year}.png"))
+            used.append((used_year, used_week))
+        print(f"[INFO] {region_name} | (ano, semana) usados: {used[::-1]}")
 
-# 2) Combinações verticais desejadas (nomes FIXOS)
-def juntar_vertical(top_region, bottom_region, out_name):
-    p1 = os.path.join(output_dir, f"{top_region}_combined.png")
-    p2 = os.path.join(output_dir, f"{bottom_region}_combined.png")
-    if os.path.exists(p1) and os.path.exists(p2):
-        final = combine_images_vertically([Image.open(p1), Image.open(p2)])
-        out = os.path.join(output_dir, out_name)
-        final.save(out)
-        print(f"[OK] Vertical: {out}")
-    else:
-        print(f"[ERRO] Arquivos não encontrados: {p1} | {p2}")
+    # 3) Combinações horizontais e verticais, direto das imagens em memória
+    tiles = {key: img for key, (img, _, _) in results.items() if img is not None}
+    build_layouts(tiles, LAYOUTS, output_dir)
 
+    print(f"[DONE] Semana final de referência (log): {week}")
+    with open(os.path.join(output_dir, "week.txt"), "w") as f:
+        f.write(str(week))
 
-juntar_vertical("Minas_Gerais", "Sao_Paulo", "combined_Minas_Gerais_Sao_Paulo.png")
-juntar_vertical("Rondonia", "Espirito_Santo", "combined_Rondonia_Espirito_Santo.png")
 
-print(f"[DONE] Semana final de referência (log): {week}")
-with open(os.path.join(output_dir, "week.txt"), "w") as f:
-    f.write(str(week))
+if __name__ == "__main__":
+    main()
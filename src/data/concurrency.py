@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Utilidades de concorrência compartilhadas pelos scrapers: pool de threads
+# limitado, resultados na ordem de entrada e limitador de taxa por host.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def env_int(name: str, default: int, minimum: int = 1) -> int:
+    env = os.getenv(name, "").strip()
+    return max(minimum, int(env)) if env.isdigit() else default
+
+
+def env_float(name: str, default: float) -> float:
+    env = os.getenv(name, "").strip()
+    try:
+        return float(env) if env else default
+    except ValueError:
+        print(f"[WARN] {name} inválido ({env}), usando {default}.")
+        return default
+
+
+class HostRateLimiter:
+    """Espaça as requisições para um mesmo host (máx. `max_per_second`), thread-safe."""
+
+    def __init__(self, max_per_second: float):
+        self.min_interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url: str):
+        if self.min_interval <= 0:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def map_ordered(func, items, max_workers: int) -> list:
+    """Aplica `func` em paralelo e devolve os resultados na ordem de `items`."""
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(it) for it in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as ex:
+        return list(ex.map(func, items))
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Histórico das previsões (códigos 1, 2, 7 e 8): arquivo só de acréscimo, chaveado
+# por (estação, modelo, rodada, horário). Cada rodada de cada modelo vira um
+# arquivo Parquet; rodadas já guardadas são puladas e só estações novas são
+# acrescentadas, então reexecuções no mesmo ciclo custam apenas os dados novos.
+# `valid_time` é sempre UTC (naive): os códigos 7 e 8 montam as séries em hora
+# local e informam o fuso, convertido aqui antes de gravar.
+#
+#   data/processed/forecasts/archive/<dataset>/model=<modelo>/run=<rodada>.parquet
+
+import os
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from forecast_store import pa, partition_slug
+
+ARCHIVE_DIR = Path("data/processed/forecasts/archive")
+KEY = ["station", "model", "run", "valid_time"]
+
+
+def run_file(dataset: str, model: str, run: str, base_dir=ARCHIVE_DIR) -> Path:
+    # sem rodada no payload, a chave vira o dia da coleta (dedup diária)
+    run = run or f"sem-rodada-{date.today().isoformat()}"
+    return (
+        Path(base_dir)
+        / dataset
+        / f"model={partition_slug(model)}"
+        / f"run={partition_slug(run)}.parquet"
+    )
+
+
+def to_utc(times: pd.Series, tz) -> pd.Series:
+    """Horários naive no fuso `tz` -> naive em UTC."""
+    times = pd.to_datetime(times)
+    return times.dt.tz_localize(tz).dt.tz_convert("UTC").dt.tz_localize(None)
+
+
+def append_runs(df: pd.DataFrame, dataset: str, tz="UTC", base_dir=ARCHIVE_DIR) -> int:
+    """Acrescenta as previsões novas (`valid_time` no fuso `tz`); nº de linhas."""
+    if pa is None:
+        print("[WARN] pyarrow não instalado: histórico de previsões ignorado.")
+        return 0
+    if df.empty:
+        return 0
+
+    df = df.astype({"station": str, "model": str, "run": str})
+    df["valid_time"] = to_utc(df["valid_time"], tz)
+    added = 0
+    for (model, run), part in df.groupby(["model", "run"], sort=False):
+        path = run_file(dataset, model, run, base_dir)
+        n_stored = 0
+        if path.exists():
+            # rodada já arquivada: só entram estações que ainda não estão lá
+            stored = pd.read_parquet(path, columns=["station"])["station"]
+            part = part[~part["station"].isin(set(stored))]
+            if part.empty:
+                continue
+            part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+            n_stored = len(stored)
+
+        part = part.drop_duplicates(KEY, keep="last").sort_values(KEY)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".parquet.part")
+        part.to_parquet(tmp, index=False)
+        os.replace(tmp, path)  # sem arquivo pela metade se o processo cair
+        added += len(part) - n_stored  # contadas depois do dedup
+
+    print(f"[ARQUIVO] {dataset}: {added} linhas novas")
+    return added
+
+
+def load(dataset: str, base_dir=ARCHIVE_DIR, **filters) -> pd.DataFrame:
+    """Histórico de um dataset; filtros por coluna (ex.: model="GFS")."""
+    root = Path(base_dir) / dataset
+    if not root.exists():
+        return pd.DataFrame(columns=KEY + ["value"])
+    files = sorted(root.glob("model=*/run=*.parquet"))
+    if "model" in filters:
+        slug = partition_slug(filters.pop("model"))
+        files = [f for f in files if f.parent.name == f"model={slug}"]
+    if not files:
+        return pd.DataFrame(columns=KEY + ["value"])
+    df = pd.concat((pd.read_parquet(f) for f in files), ignore_index=True)
+    for col, value in filters.items():
+        df = df[df[col] == value]
+    return df.reset_index(drop=True)
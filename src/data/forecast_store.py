@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# Armazenamento das previsões meteologix (códigos 7 e 8) em formato longo:
+# (estação, modelo, rodada, horário, valor) em vetores pré-alocados. As abas do
+# Excel saem como visões "wide" (Stn Name + uma coluna por data) via pivot; para
+# análise, o mesmo conteúdo vai para Parquet particionado (se o pyarrow existir).
+
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # saída Parquet é opcional
+    pa = ds = None
+
+# "18.10.2025 06z" -> rodada do modelo
+RUN_FORMAT = "%d.%m.%Y %Hz"
+
+
+def run_dates(runs: pd.Series) -> pd.Series:
+    """Data (YYYY-MM-DD) da rodada; sem rodada no payload, usa a data de hoje."""
+    parsed = pd.to_datetime(
+        runs.astype(str).str.strip(), format=RUN_FORMAT, errors="coerce"
+    )
+    return parsed.dt.strftime("%Y-%m-%d").fillna(date.today().isoformat())
+
+
+def partition_slug(name: str) -> str:
+    # nomes como "ECMWF(0/6/12/18)" não podem virar diretório como estão
+    return re.sub(r"[^\w.-]+", "_", name).strip("_")
+
+
+class ForecastStore:
+    """Previsões em formato longo; anexar uma série custa O(1) amortizado."""
+
+    def __init__(self, capacity: int = 4096):
+        self._n = 0
+        # estação, modelo e rodada guardados como códigos inteiros
+        self._names = {"station": {}, "model": {}, "run": {}}
+        self._station = np.empty(capacity, dtype="int32")
+        self._model = np.empty(capacity, dtype="int32")
+        self._run = np.empty(capacity, dtype="int32")
+        self._time = np.empty(capacity, dtype="datetime64[ns]")
+        self._value = np.empty(capacity, dtype="float64")
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _code(self, kind: str, name) -> int:
+        names = self._names[kind]
+        return names.setdefault("" if name is None else str(name), len(names))
+
+    def _reserve(self, k: int):
+        need = self._n + k
+        if need <= len(self._value):
+            return
+        cap = max(2 * len(self._value), need)
+        for attr in ("_station", "_model", "_run", "_time", "_value"):
+            old = getattr(self, attr)
+            new = np.empty(cap, dtype=old.dtype)
+            new[: self._n] = old[: self._n]
+            setattr(self, attr, new)
+
+    def append(self, station, model, run, times, values):
+        """Anexa a série (horários e valores) de uma estação/modelo."""
+        values = np.asarray(values, dtype="float64")
+        k = len(values)
+        self._reserve(k)
+        i, j = self._n, self._n + k
+        self._station[i:j] = self._code("station", station)
+        self._model[i:j] = self._code("model", model)
+        self._run[i:j] = self._code("run", run)
+        self._time[i:j] = np.asarray(times, dtype="datetime64[ns]")
+        self._value[i:j] = values
+        self._n = j
+
+    def _labels(self, kind: str, codes: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(codes, categories=list(self._names[kind]))
+
+    def frame(self) -> pd.DataFrame:
+        """Visão longa completa (para comparações entre modelos e para os sinks)."""
+        n = self._n
+        return pd.DataFrame(
+            {
+                "station": self._labels("station", self._station[:n]),
+                "model": self._labels("model", self._model[:n]),
+                "run": self._labels("run", self._run[:n]),
+                "valid_time": self._time[:n],
+                "value": self._value[:n],
+            }
+        )
+
+    def wide(self, model, at_hour: int | None = None, stations=None) -> pd.DataFrame:
+        """Aba do Excel: `Stn Name` + uma coluna "%d-%m-%Y" por horário do modelo."""
+        n = self._n
+        code = self._names["model"].get(model, -1)
+        mask = self._model[:n] == code
+        times = pd.DatetimeIndex(self._time[:n][mask])
+        keep = np.ones(len(times), dtype=bool)
+        if at_hour is not None:
+            keep = times.hour == at_hour
+
+        names = np.array(list(self._names["station"]), dtype=object)
+        long = pd.DataFrame(
+            {
+                "station": names[self._station[:n][mask][keep]],
+                "valid_time": times[keep],
+                "value": self._value[:n][mask][keep],
+            }
+        )
+        # se a mesma estação vier em mais de uma rodada, fica a última anexada
+        long = long.drop_duplicates(["station", "valid_time"], keep="last")
+        table = long.pivot(index="station", columns="valid_time", values="value")
+
+        # linhas na ordem da planilha de entrada (estações sem dados ficam vazias)
+        order = list(stations) if stations is not None else list(names)
+        table = table.reindex(pd.Index(order, name="station"))
+        table.columns = pd.DatetimeIndex(table.columns).strftime("%d-%m-%Y")
+        table.insert(0, "Stn Name", order)
+        return table.reset_index(drop=True)
+
+    def to_parquet(self, base_dir) -> bool:
+        """Grava em Parquet particionado por run_date/model (hive); True se gravou."""
+        if ds is None:
+            print("[WARN] pyarrow não instalado: saída Parquet ignorada.")
+            return False
+        df = self.frame()
+        df["model_name"] = df["model"].astype(str)
+        df["model"] = df["model_name"].map(partition_slug)
+        df["station"] = df["station"].astype(str)
+        df["run"] = df["run"].astype(str)
+        df["run_date"] = run_dates(df["run"])
+        ds.write_dataset(
+            pa.Table.from_pandas(df, preserve_index=False),
+            base_dir,
+            format="parquet",
+            partitioning=["run_date", "model"],
+            partitioning_flavor="hive",
+            # reexecução no mesmo dia substitui só as partições reescritas
+            existing_data_behavior="delete_matching",
+            basename_template="part-{i}.parquet",
+        )
+        return True
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Download de arquivos grandes (planilha CECAFE) em streaming para um .part,
+# com rename atômico no fim. Guarda ETag/Last-Modified e o sha256 do último
+# arquivo num JSON ao lado: a próxima execução faz requisição condicional (304 =
+# nada a baixar) e, se o conteúdo vier idêntico, não grava outra cópia. Uma
+# transferência interrompida continua de onde parou (Range + If-Range); falhas de
+# conexão são repetidas com espera crescente.
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import requests
+
+CHUNK_SIZE = 1 << 16
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_state(path: Path) -> dict:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: Path, state: dict):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_text(json.dumps(state, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _validators(resp: requests.Response) -> dict:
+    return {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    }
+
+
+def _request_headers(state: dict, part: Path) -> dict:
+    # sem compressão de transporte: Range e Content-Length contam os bytes do arquivo
+    headers = {"Accept-Encoding": "identity"}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    partial = state.get("partial") or {}
+    validator = partial.get("etag") or partial.get("last_modified")
+    if part.exists() and validator:
+        # retoma só se o arquivo no servidor ainda for o mesmo (If-Range)
+        headers["Range"] = f"bytes={part.stat().st_size}-"
+        headers["If-Range"] = validator
+    return headers
+
+
+def _stream(resp: requests.Response, part: Path, append: bool) -> int:
+    written = part.stat().st_size if append else 0
+    with open(part, "ab" if append else "wb") as f:
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def _expected_size(resp: requests.Response) -> int | None:
+    if resp.status_code == 206:
+        # "bytes 1000-1999/2000" -> 2000
+        total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+    length = resp.headers.get("Content-Length", "")
+    return int(length) if length.isdigit() else None
+
+
+def _backoff(attempt: int, attempts: int):
+    # espera crescente entre tentativas (nenhuma depois da última)
+    if attempt < attempts:
+        time.sleep(2**attempt)
+
+
+def fetch_if_changed(
+    url: str,
+    dest: Path,
+    state_path: Path,
+    session: requests.Session | None = None,
+    timeout=(15, 120),
+    attempts: int = 3,
+) -> Path | None:
+    """Baixa `url` em `dest` se mudou desde a última vez; None se nada mudou."""
+    http = session or requests
+    dest, state_path = Path(dest), Path(state_path)
+    part = state_path.with_suffix(".download.part")
+    state = load_state(state_path)
+
+    error = None
+    for attempt in range(1, attempts + 1):
+        headers = _request_headers(state, part)
+        try:
+            resp = http.get(url, headers=headers, stream=True, timeout=timeout)
+        except requests.RequestException as e:
+            # conexão recusada/caída ou timeout antes da resposta: tenta de novo
+            error = e
+            print(f"[WARN] Falha na requisição ({e}); tentativa {attempt}")
+            _backoff(attempt, attempts)
+            continue
+        with resp:
+            if resp.status_code == 304:
+                part.unlink(missing_ok=True)
+                if state.pop("partial", None) is not None:
+                    save_state(state_path, state)
+                print(f"[OK] Sem mudança no servidor (304): {url}")
+                return None
+            if resp.status_code == 416:
+                # pedaço guardado não serve mais para retomar: começa do zero
+                part.unlink(missing_ok=True)
+                continue
+            if resp.status_code not in (200, 206):
+                raise RuntimeError(
+                    f"Falha ao baixar o arquivo (status {resp.status_code})"
+                )
+            append = resp.status_code == 206
+            # validadores do arquivo em andamento, para retomar se cair
+            state["partial"] = _validators(resp)
+            save_state(state_path, state)
+            try:
+                written = _stream(resp, part, append)
+            except requests.RequestException as e:
+                error = e
+                print(f"[WARN] Transferência interrompida ({e}); tentativa {attempt}")
+                _backoff(attempt, attempts)
+                continue
+            expected = _expected_size(resp)
+            if expected is not None and written != expected:
+                print(f"[WARN] Recebidos {written} de {expected} bytes; retomando")
+                _backoff(attempt, attempts)
+                continue
+            validators = state.pop("partial")
+            break
+    else:
+        raise RuntimeError(
+            f"Download incompleto após {attempts} tentativas: {url}"
+        ) from error
+
+    sha = sha256_file(part)
+    state.update(validators)
+    if sha == state.get("sha256"):
+        part.unlink()
+        save_state(state_path, state)
+        print(f"[OK] Conteúdo idêntico ao último ({sha[:12]}): nada gravado")
+        return None
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(part, dest)
+    state.update({"sha256": sha, "file": dest.name})
+    save_state(state_path, state)
+    return dest
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# Histórico diário de cotações do Yahoo Finance (código 6): dólar, café e o que mais
+# entrar em SYMBOLS. Cada execução baixa cada símbolo só a partir da sua última
+# data guardada (símbolos com a mesma data vão juntos numa chamada) e acrescenta
+# com dedup por (símbolo, data). Um arquivo por símbolo e ano: gravar custa só o
+# ano corrente.
+#
+#   data/processed/market/<símbolo>/<ano>.parquet   (.csv sem pyarrow)
+
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:  # sem pyarrow, grava CSV
+    pyarrow = None
+
+STORE_DIR = Path("data/processed/market")
+START_DATE = "2020-01-01"  # início do histórico de um símbolo novo
+
+# símbolo Yahoo -> descrição
+SYMBOLS = {
+    "BRL=X": "USD/BRL",
+    "KC=F": "Café arábica (ICE, contrato contínuo)",
+}
+
+FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+SUFFIX = ".parquet" if pyarrow is not None else ".csv"
+
+
+def _read(path: Path) -> pd.DataFrame:
+    if SUFFIX == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path, parse_dates=["date"])
+
+
+def _write(df: pd.DataFrame, path: Path):
+    tmp = path.with_name(path.name + ".part")
+    if SUFFIX == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def symbol_dir(symbol: str, base_dir=STORE_DIR) -> Path:
+    # "BRL=X" -> "BRL_X"
+    return Path(base_dir) / re.sub(r"[^\w.-]+", "_", symbol).strip("_")
+
+
+def load(symbol: str, since=None, base_dir=STORE_DIR) -> pd.DataFrame:
+    """Histórico do símbolo; com `since`, só as datas a partir dela (inclusive)."""
+    files = sorted(symbol_dir(symbol, base_dir).glob(f"*{SUFFIX}"))
+    if since is not None:
+        files = [f for f in files if int(f.stem) >= since.year]
+    if not files:
+        return pd.DataFrame(columns=["date"] + FIELDS)
+    df = pd.concat((_read(f) for f in files), ignore_index=True)
+    if since is not None:
+        df = df[df["date"] >= since].reset_index(drop=True)
+    return df
+
+
+def last_date(symbol: str, base_dir=STORE_DIR) -> pd.Timestamp | None:
+    # só o arquivo do ano mais recente precisa ser lido
+    files = sorted(symbol_dir(symbol, base_dir).glob(f"*{SUFFIX}"))
+    return _read(files[-1])["date"].max() if files else None
+
+
+def append(symbol: str, df: pd.DataFrame, base_dir=STORE_DIR) -> int:
+    """Acrescenta barras diárias (coluna date + FIELDS); devolve nº de datas novas."""
+    if df.empty:
+        return 0
+    folder = symbol_dir(symbol, base_dir)
+    folder.mkdir(parents=True, exist_ok=True)
+    added = 0
+    for year, part in df.groupby(df["date"].dt.year):
+        path = folder / f"{year}{SUFFIX}"
+        if path.exists():
+            stored = _read(path)
+            added += (~part["date"].isin(stored["date"])).sum()
+            part = pd.concat([stored, part], ignore_index=True)
+        else:
+            added += len(part)
+        # a barra do último dia pode ter sido parcial: a nova prevalece
+        part = part.drop_duplicates("date", keep="last").sort_values("date")
+        _write(part.reset_index(drop=True), path)
+    return int(added)
+
+
+def _bars(hist: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    """Barras de um símbolo a partir do retorno do yf.download (1 ou N símbolos)."""
+    if isinstance(hist.columns, pd.MultiIndex):
+        if symbol not in hist.columns.get_level_values(0):
+            return pd.DataFrame(columns=["date"] + FIELDS)
+        hist = hist[symbol]
+    part = hist.dropna(how="all").reindex(columns=FIELDS)
+    index = pd.to_datetime(part.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    part.index = index.normalize()
+    return part.rename_axis("date").reset_index()
+
+
+def update(symbols=SYMBOLS, base_dir=STORE_DIR) -> dict:
+    """Baixa só o que falta de cada símbolo; {símbolo: nº de datas novas}."""
+    import yfinance as yf
+
+    # rebaixa o último dia guardado (pode ter sido capturado antes do fechamento);
+    # símbolos com a mesma data de início dividem uma chamada
+    groups = {}
+    for s in symbols:
+        last = last_date(s, base_dir)
+        start = last.strftime("%Y-%m-%d") if last is not None else START_DATE
+        groups.setdefault(start, []).append(s)
+
+    added = {}
+    for start, group in groups.items():
+        hist = yf.download(
+            group,
+            start=start,
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False,
+            threads=True,
+        )
+        if hist is None or hist.empty:
+            print(f"[WARN] Yahoo Finance: nada desde {start} para {group}.")
+            added.update(dict.fromkeys(group, 0))
+            continue
+        for s in group:
+            added[s] = append(s, _bars(hist, s), base_dir)
+            print(f"[OK] {s}: {added[s]} datas novas (desde {start})")
+    return {s: added[s] for s in symbols}
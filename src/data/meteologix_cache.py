@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Cache local das respostas meteologix por estação e endpoint. Os modelos só mudam
+# a cada ciclo (00/06/12/18 UTC + atraso de publicação): dentro do mesmo ciclo a
+# resposta sai do disco, sem rede. Cada consumidor (chuva, temp. mínima, GFS)
+# guarda à parte as rodadas que já processou, marcadas só depois de gravar as
+# saídas: o mesmo endpoint lido por dois scripts não faz um pular o outro.
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from concurrency import env_float, env_int
+
+CACHE_DIR = Path("data/interim/meteologix_cache")
+
+
+def cycle_start(now: datetime, cycle_hours: int, lag_hours: float) -> datetime:
+    """Início do ciclo de modelo vigente em `now` (UTC), já somado o atraso."""
+    t = now - timedelta(hours=lag_hours)
+    t = t.replace(hour=t.hour - t.hour % cycle_hours, minute=0, second=0, microsecond=0)
+    return t + timedelta(hours=lag_hours)
+
+
+def _tmp_path(path: Path) -> Path:
+    # nome único por processo e thread: duas gravações da mesma chave não se cruzam
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+
+
+class ResponseCache:
+    """Respostas em `data/interim/meteologix_cache`, uma por (endpoint, estação)."""
+
+    def __init__(
+        self,
+        base_dir=CACHE_DIR,
+        cycle_hours: int | None = None,
+        lag_hours: float | None = None,
+    ):
+        self.base_dir = Path(base_dir)
+        self.cycle_hours = cycle_hours or env_int("METEOLOGIX_CYCLE_HOURS", 6)
+        # tempo entre o início da rodada e os dados aparecerem no site
+        self.lag_hours = (
+            lag_hours
+            if lag_hours is not None
+            else env_float("METEOLOGIX_CYCLE_LAG_HOURS", 4.0)
+        )
+
+    def _path(self, key: str, suffix: str = ".json.gz") -> Path:
+        return self.base_dir / (re.sub(r"[^\w.-]+", "_", key) + suffix)
+
+    def load(self, key: str) -> dict | None:
+        try:
+            with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, text: str, run: str | None):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(path)
+        entry = {"fetched_at": time.time(), "run": run, "text": text}
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    def fresh(self, entry: dict) -> bool:
+        """Entrada baixada já no ciclo vigente (nenhuma rodada nova desde então)."""
+        now = datetime.now(timezone.utc)
+        start = cycle_start(now, self.cycle_hours, self.lag_hours)
+        return entry.get("fetched_at", 0) >= start.timestamp()
+
+    def processed(self, consumer: str) -> dict:
+        """Rodadas (chave -> assinatura) da última execução concluída de `consumer`."""
+        path = self._path(f"processed-{consumer}", ".json")
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def mark_processed(self, consumer: str, runs: dict):
+        path = self._path(f"processed-{consumer}", ".json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(path)
+        tmp.write_text(json.dumps(runs, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, path)
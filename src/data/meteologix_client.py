@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+# Cliente meteologix compartilhado (códigos 1, 2, 7 e 8): sessões aquecidas em pool,
+# CSRF automático com cache, limite de taxa por host e retries com backoff.
+
+import re
+import time
+import queue
+import random
+import os
+import threading
+import requests
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from concurrency import HostRateLimiter, env_float, env_int
+from meteologix_cache import ResponseCache
+from meteologix_parser import run_signature
+
+# --------------------------------------------------------------------
+# Config
+# --------------------------------------------------------------------
+BASE_URL = "https://meteologix.com"
+XLTREND_PATH = "/br/ajax_pub/fcxlc?"
+ENSEMBLE_PATH = "/{region}/ajax/ensemble"
+
+UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36"
+
+HEADERS_GET = {
+    "User-Agent": UA,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "Connection": "keep-alive",
+}
+
+HEADERS_POST_BASE = {
+    "User-Agent": UA,
+    "Accept": "text/html, */*; q=0.01",
+    "X-Requested-With": "XMLHttpRequest",
+    "Origin": BASE_URL,
+    "Connection": "keep-alive",
+}
+
+ALT_HEADER_SETS = [
+    HEADERS_GET,
+    {**HEADERS_GET, "Referer": f"{BASE_URL}/br/"},
+    {"User-Agent": UA, "Accept": "*/*"},
+]
+
+CONSENT_COOKIE = {
+    # cookie de consentimento genérico; o site muitas vezes exige um valor presente
+    "euconsent-v2": "CP-mp8AP-mp8AAGABCENAzEgAP_gAAAAABBoJphFBCpMDWFAMGBVAJAgSYAU19AQIAQAABCAAwAFAAGA4IAA0QAAEAQAAAAAAAAAgVABAAAAAABEAACAAAAEAQBEAAAAgAAIAAAAAAEQQgBAAAgAAAAAAAAIAAABAwQAkACAIQKEBEAghIAACAAAAIABAACAAAMACEAYAAAAAAIAAIBAAAIEEAIAAAEAAQAAAAAAAAAAAAAAAAAAgAAALCQIAAEAAVAA4ACAAGgARAAmABvAD8AISAQwBEgCOAEsAMOAfYB-gEUAI0AXMAvQBigDaAG4AUOAvMBhoDVwG5gOCAcmA8cCEIEOQgAQAGQB_QIGAQuHQHAAKgAcABAADQAIgATAA3gB-gEMARIAlgBhgDRgH2AfsBFAEWALmAYoA2gBuAEXgJkAUOAvMBhoDLAGrgOTAeOBDkcANAAQABcAGQAUABHAF6APkAf0BdADBAGmgNzAgYQgEgBMADeAI4AigBcwDFAG0AeOBCggACAAQAwQlAMAAQABwAIgATIBDAESAI4AfgBcwDFAIvAXmBCEkACAAuAywpAaAAqABwAEAANAAiABMACkAH6AQwBEgDRgH4AfoBFgC5gGKANoAbgBF4ChwF5gMNAZYA4IByYDxwIQgQ5KACgAFAAXABkAFsARwA-wF0AMEAbmBAwtADAEcAXoB44A.YAAAAAAAAAAA"
+}
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+STALE_TOKEN_STATUS = (403, 419)
+
+
+# --------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------
+def station_id(url: str) -> str:
+    """Id numérico da cidade em URLs do tipo .../forecast/3472603-alfenas/..."""
+    m = re.search(r"/forecast/(\d+)", url)
+    return m.group(1) if m else url[35:42]
+
+
+def get_csrf_token(html: str) -> str | None:
+    m = re.search(
+        r'name=["\']csrf-token["\']\s+content=["\'](.*?)["\']', html, flags=re.I
+    )
+    if not m:
+        m = re.search(
+            r'content=["\'](.*?)["\']\s+name=["\']csrf-token["\']', html, flags=re.I
+        )
+    return m.group(1) if m else None
+
+
+class Fetched(NamedTuple):
+    text: str | None
+    run: str | None
+    # chave no cache; com `run`, identifica o que cada consumidor já processou
+    key: str
+
+
+class WarmSession:
+    """Sessão aquecida com o CSRF em cache (o token é atrelado aos cookies da sessão)."""
+
+    def __init__(self, client: "MeteologixClient"):
+        self.client = client
+        self.session = requests.Session()
+        self.token = self.warm_up()
+        self.token_ts = time.monotonic() if self.token else 0.0
+
+    def warm_up(self) -> str | None:
+        # seed cookies no domínio e consentimento; devolve o CSRF da home, se houver
+        self.session.cookies.update(CONSENT_COOKIE)
+        token = None
+        for url in [f"{BASE_URL}/", f"{BASE_URL}/br/"]:
+            try:
+                self.client.limiter.wait(url)
+                r = self.session.get(
+                    url, headers=HEADERS_GET, timeout=20, allow_redirects=True
+                )
+                # não levantar exceção aqui; alguns retornam 403/redirects intermitentes
+                if r.status_code == 200:
+                    token = get_csrf_token(r.text) or token
+            except requests.RequestException:
+                pass
+        return token
+
+    def csrf_token(self, referer_url: str) -> str | None:
+        if self.token and time.monotonic() - self.token_ts < self.client.token_ttl:
+            return self.token
+        # token ausente ou vencido: relê uma página (tenta cabeçalhos diferentes se 403)
+        for hs in ALT_HEADER_SETS:
+            try:
+                self.client.limiter.wait(referer_url)
+                r0 = self.session.get(
+                    referer_url, headers=hs, timeout=30, allow_redirects=True
+                )
+                if r0.status_code == 200:
+                    self.token = get_csrf_token(r0.text)
+                    self.token_ts = time.monotonic()
+                    break
+            except requests.RequestException:
+                time.sleep(0.6)
+        return self.token
+
+    def invalidate(self):
+        self.token = None
+
+
+# --------------------------------------------------------------------
+# Cliente
+# --------------------------------------------------------------------
+class MeteologixClient:
+    """Pool de sessões aquecidas reaproveitadas (cookies, CSRF e keep-alive) entre jobs."""
+
+    def __init__(
+        self,
+        max_rps: float | None = None,
+        token_ttl: float | None = None,
+        max_retries: int | None = None,
+    ):
+        self.limiter = HostRateLimiter(
+            max_rps if max_rps is not None else env_float("METEOLOGIX_MAX_RPS", 4.0)
+        )
+        # validade do CSRF em cache (s); renovado antes disso só se o site devolver 403/419
+        self.token_ttl = (
+            token_ttl
+            if token_ttl is not None
+            else env_float("METEOLOGIX_TOKEN_TTL", 1800.0)
+        )
+        # novas tentativas depois da primeira (0 = uma tentativa só)
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else env_int("METEOLOGIX_MAX_RETRIES", 4, minimum=0)
+        )
+        self._free = queue.LifoQueue()
+        # METEOLOGIX_CACHE=0 desliga o cache de respostas (sempre baixa tudo)
+        self.cache = None if os.getenv("METEOLOGIX_CACHE") == "0" else ResponseCache()
+        # um lock por chave: jobs simultâneos (chuva e temp_min) pedindo a mesma
+        # estação esperam o primeiro download e leem a resposta dele do cache
+        self._key_locks = {}
+        self._key_locks_guard = threading.Lock()
+
+    @contextmanager
+    def session(self):
+        try:
+            ws = self._free.get_nowait()
+        except queue.Empty:
+            ws = WarmSession(self)
+        try:
+            yield ws
+        finally:
+            self._free.put(ws)
+
+    def warm_up(self):
+        """Aquece uma sessão antecipadamente (cookies + CSRF) para os jobs seguintes."""
+        with self.session():
+            pass
+
+    def post(
+        self, path: str, referer_url: str, data: dict, marker: str | None = None
+    ) -> str | None:
+        url = BASE_URL + path
+        headers_post = {**HEADERS_POST_BASE, "Referer": referer_url.strip()}
+
+        with self.session() as ws:
+            for attempt in range(self.max_retries + 1):
+                token = ws.csrf_token(referer_url)
+                if token:
+                    headers_post["X-CSRF-Token"] = token
+                self.limiter.wait(url)
+                try:
+                    r = ws.session.post(url, headers=headers_post, data=data, timeout=60)
+                except requests.RequestException as e:
+                    print(f"[WARN] Rede ({url}): {e}")
+                    time.sleep(1.2 * (attempt + 1) + random.random())
+                    continue
+                if r.status_code == 200 and (marker is None or marker in r.text):
+                    return r.text
+                if r.status_code in STALE_TOKEN_STATUS:
+                    # token recusado: força nova leitura na próxima tentativa
+                    ws.invalidate()
+                    time.sleep(0.6 + random.random())
+                    continue
+                if r.status_code in RETRY_STATUS:
+                    time.sleep(1.2 * (attempt + 1) + random.random())
+                    continue
+                # outros status: tenta mais uma vez com Accept simples
+                headers_post["Accept"] = "*/*"
+                time.sleep(0.8)
+        return None
+
+    def fetch_xltrend(self, city_id: str, referer_url: str | None = None) -> str | None:
+        """HTML do XL Trend (séries `hc_data_*` de todos os modelos determinísticos)."""
+        referer_url = referer_url or f"{BASE_URL}/br/forecast/{city_id}/xltrend"
+        data = {"city_id": city_id, "lang": "en", "unit_t": "celsius"}
+        return self.post(XLTREND_PATH, referer_url, data, marker="hc_data_")
+
+    def fetch_ensemble(
+        self,
+        city_id: str,
+        model: str,
+        param: str,
+        referer_url: str | None = None,
+        region: str = "br",
+    ) -> str | None:
+        """Resposta do ensemble (`model` = usa/euro, `param` = temperatur, mintemperatur, niederschlag24h...)."""
+        referer_url = referer_url or f"{BASE_URL}/{region}/forecast/{city_id}/ensemble"
+        data = {
+            "city_id": city_id,
+            "model": model,
+            "model_view": "range",
+            "param": param,
+        }
+        return self.post(ENSEMBLE_PATH.format(region=region), referer_url, data)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._key_locks_guard:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def fetch_cached(self, key: str, fetch) -> Fetched:
+        """`fetch()` com cache: no ciclo vigente lê do disco, sem rede."""
+        if not self.cache:
+            text = fetch()
+            return Fetched(text, run_signature(text) if text else None, key)
+        with self._key_lock(key):
+            entry = self.cache.load(key)
+            if entry and self.cache.fresh(entry):
+                return Fetched(entry["text"], entry["run"], key)
+            text = fetch()
+            if text is None:
+                return Fetched(None, None, key)
+            run = run_signature(text)
+            self.cache.save(key, text, run)
+            return Fetched(text, run, key)
+
+    def already_processed(self, consumer: str, responses) -> bool:
+        """Todas as respostas trazem as rodadas da última execução concluída."""
+        if not self.cache or not responses:
+            return False
+        runs = {r.key: r.run for r in responses}
+        return None not in runs.values() and runs == self.cache.processed(consumer)
+
+    def mark_processed(self, consumer: str, responses):
+        """Chamar só depois de gravar as saídas: se algo falhar, a rodada é refeita."""
+        if self.cache:
+            self.cache.mark_processed(consumer, {r.key: r.run for r in responses})
+
+    def fetch_xltrend_cached(
+        self, city_id: str, referer_url: str | None = None
+    ) -> Fetched:
+        return self.fetch_cached(
+            f"xltrend-{city_id}", lambda: self.fetch_xltrend(city_id, referer_url)
+        )
+
+    def fetch_ensemble_cached(
+        self,
+        city_id: str,
+        model: str,
+        param: str,
+        referer_url: str | None = None,
+        region: str = "br",
+    ) -> Fetched:
+        return self.fetch_cached(
+            f"ensemble-{region}-{model}-{param}-{city_id}",
+            lambda: self.fetch_ensemble(city_id, model, param, referer_url, region),
+        )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MeteologixClient:
+    """Cliente único do processo: jobs combinados dividem pool de conexões e CSRF."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MeteologixClient()
+        return _client
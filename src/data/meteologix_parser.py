@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# Parser das respostas meteologix (códigos 1, 2, 7 e 8). Lê os literais JS do
+# Highcharts (`hc_data_* = [{name: ..., run: ..., data: [[ts, v], ...]}, ...]`) em
+# uma única passada, sem reescrever o texto em JSON nem depender de números de
+# linha. Os vetores numéricos (`data` e as linhas dos ensembles) já são JSON válido
+# e vão direto para o decoder em C.
+
+import re
+import json
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# separadores ignorados: espaços, vírgulas e comentários JS
+_SEP = r"(?:[\s,]+|//[^\n]*|/\*.*?\*/)*"
+_WS = r"(?:\s+|//[^\n]*|/\*.*?\*/)*"
+# valor: número | string ('...' ou "...") | identificador | abertura de array/objeto
+_VALUE = r"""(?:
+    (?P<num>-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | '(?P<sq>[^'\\]*(?:\\.[^'\\]*)*)'
+  | "(?P<dq>[^"\\]*(?:\\.[^"\\]*)*)"
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<open>[\[{])
+)"""
+# um membro inteiro `chave: valor` (ou o fechamento do objeto) por match
+_MEMBER = re.compile(
+    _SEP
+    + r"""(?:(?P<close>\})
+        |(?:(?P<key>[A-Za-z_$][\w$]*)|'(?P<skey>[^']*)'|"(?P<dkey>[^"]*)")"""
+    + _WS
+    + ":"
+    + _WS
+    + _VALUE
+    + ")",
+    re.X | re.S,
+)
+# sequência de membros escalares `chave: 'texto' | número | literal` casada de uma vez
+_KEY = r"""(?:([A-Za-z_$][\w$]*)|'([^']*)'|"([^"]*)")"""
+_SCALAR = r"""(?:'([^'\\]*(?:\\.[^'\\]*)*)'|"([^"\\]*(?:\\.[^"\\]*)*)"|([-\w.+$]+))"""
+_SCALAR_RUN = re.compile(r"(?:[\s,]*" + _KEY + r"\s*:\s*" + _SCALAR + r"(?=\s*[,}]))+")
+_SCALAR_PAIR = re.compile(_KEY + r"\s*:\s*" + _SCALAR)
+_ITEM = re.compile(_SEP + r"(?:(?P<close>\])|" + _VALUE + ")", re.X | re.S)
+_SINGLE = re.compile(_WS + _VALUE, re.X | re.S)
+
+_KEYWORDS = {"true": True, "false": False, "null": None, "undefined": None}
+_BLOCK = re.compile(r"(hc_data_\w+)\s*[=:]\s*(?=[\[{])")
+# sequência de linhas [ts_ms, v1, v2, ...] consecutivas (um bloco de ensemble)
+_ROW_RUN = re.compile(r"(?:\[\s*-?\d{10,}\s*,[^\[\]]*\][\s,]*)+")
+_JSON = json.JSONDecoder()
+# rodada do modelo no texto da página ("Run: 18.10.2025 06z UTC")
+_RUN = re.compile(r"\d{2}\.\d{2}\.\d{4},?\s+\d{2}z")
+
+
+class ParseError(ValueError):
+    pass
+
+
+def _bare(tok: str):
+    if tok in _KEYWORDS:
+        return _KEYWORDS[tok]
+    try:
+        return int(tok)
+    except ValueError:
+        pass
+    try:
+        return float(tok)
+    except ValueError:
+        return tok  # identificador solto
+
+
+def _unescape(s: str) -> str:
+    return s.replace("\\'", "'").replace('\\"', '"') if "\\" in s else s
+
+
+def _value(text: str, m, flatten: bool = False):
+    """Converte o valor casado em `m`; devolve (valor, posição seguinte)."""
+    kind = m.lastgroup
+    if kind == "num":
+        tok = m.group("num")
+        is_float = "." in tok or "e" in tok or "E" in tok
+        return (float(tok) if is_float else int(tok)), m.end()
+    if kind in ("sq", "dq"):
+        return _unescape(m.group(kind)), m.end()
+    if kind == "ident":
+        return _KEYWORDS.get(m.group("ident"), m.group("ident")), m.end()
+    if m.group("open") == "{":
+        return _object(text, m.end())
+    # caminho rápido: arrays só com números/null já são JSON
+    try:
+        arr, end = _JSON.raw_decode(text, m.start("open"))
+    except ValueError:
+        return _array(text, m.end(), flatten)
+    # `data: [[ts, v], ...]` vira direto o vetor plano [ts, v, ts, v, ...]
+    if flatten and arr and isinstance(arr[0], list):
+        arr = list(chain.from_iterable(arr))
+    return arr, end
+
+
+def _array(text: str, pos: int, flatten: bool = False):
+    out = []
+    while True:
+        m = _ITEM.match(text, pos)
+        if not m:
+            raise ParseError(f"array inválido na posição {pos}")
+        if m.group("close"):
+            return out, m.end()
+        item, pos = _value(text, m)
+        if flatten and isinstance(item, list):
+            out.extend(item)
+        else:
+            out.append(item)
+
+
+def _object(text: str, pos: int):
+    out = {}
+    while True:
+        # membros escalares em bloco (um match + um findall), o resto membro a membro
+        run = _SCALAR_RUN.match(text, pos)
+        if run:
+            for k1, k2, k3, sq, dq, bare in _SCALAR_PAIR.findall(text, pos, run.end()):
+                if sq or dq:
+                    out[k1 or k2 or k3] = _unescape(sq or dq)
+                else:
+                    out[k1 or k2 or k3] = _bare(bare) if bare else ""
+            pos = run.end()
+        m = _MEMBER.match(text, pos)
+        if not m:
+            raise ParseError(f"objeto inválido na posição {pos}")
+        if m.group("close"):
+            return out, m.end()
+        key = m.group("key") or m.group("skey") or m.group("dkey")
+        out[key], pos = _value(text, m, flatten=key == "data")
+
+
+def parse_js_literal(text: str, pos: int = 0):
+    """Lê um literal JS (objeto, array ou escalar) em `pos`; devolve (valor, fim)."""
+    m = _SINGLE.match(text, pos)
+    if not m:
+        raise ParseError(f"literal inválido na posição {pos}")
+    return _value(text, m)
+
+
+def parse_hc_blocks(html: str, names=None) -> dict:
+    """Blocos `hc_data_*` da resposta (todos ou só `names`), na ordem do texto."""
+    blocks, pos = {}, 0
+    while True:
+        m = _BLOCK.search(html, pos)
+        if not m:
+            return blocks
+        pos = m.end()
+        if names is not None and m.group(1) not in names:
+            continue
+        try:
+            blocks[m.group(1)], pos = parse_js_literal(html, pos)
+        except ParseError as e:
+            print(f"[WARN] {m.group(1)} ignorado: {e}")
+
+
+def model_key(item: dict) -> str | None:
+    # o ECMWF 6z/18z às vezes vem só com o longname
+    if item.get("longname") == "ECMWF 6z/18z":
+        return "ECMWF(0/6/12/18)"
+    return item.get("name")
+
+
+def parse_row_blocks(text: str) -> list:
+    """Blocos de linhas `[ts, v1, ...]` consecutivas (ensembles), na ordem do texto."""
+    return [
+        json.loads("[" + m.group(0).rstrip(", \t\r\n") + "]")
+        for m in _ROW_RUN.finditer(text)
+    ]
+
+
+def run_string(text: str) -> str | None:
+    """Primeira rodada "dd.mm.aaaa hhz" citada na resposta (ensembles)."""
+    m = _RUN.search(text)
+    return " ".join(m.group(0).replace(",", "").split()) if m else None
+
+
+def run_signature(text: str) -> str | None:
+    """Todas as rodadas citadas na resposta, ordenadas (muda se algum modelo rodou)."""
+    runs = {" ".join(r.replace(",", "").split()) for r in _RUN.findall(text)}
+    return "|".join(sorted(runs)) or None
+
+
+def split_series(flat, tz) -> tuple[np.ndarray, pd.DatetimeIndex]:
+    """`[t1, v1, t2, v2, ...]` (epoch ms) -> (valores, horários locais sem fuso)."""
+    # null vira NaN; epoch ms cabe exato em float64
+    arr = np.asarray(flat, dtype="float64")
+    times = (
+        pd.to_datetime(arr[0::2].astype("int64"), unit="ms", utc=True)
+        .tz_convert(tz)
+        .tz_localize(None)
+    )
+    return arr[1::2], times
+
+
+def split_rows(rows, tz) -> tuple[np.ndarray, pd.DatetimeIndex]:
+    """Linhas `[ts, v, ...]` de ensemble -> (primeira coluna de valores, horários)."""
+    arr = np.asarray(rows, dtype="float64")
+    return split_series(arr[:, :2].ravel(), tz)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# Série semanal de VHI da NOAA (get_TS_admin.php) por estado produtor de café,
+# guardada em CSV por província. Cada execução só pede os anos a partir da última
+# semana já guardada (o último ano é sempre rebaixado: a NOAA vai acrescentando
+# semanas); a carga completa desde 1982 acontece uma vez, na primeira execução.
+#
+#   data/processed/noaa_vhi/<região>.csv   (year, week, c2, c3, ...)
+
+import io
+import os
+import re
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+from concurrency import env_int, map_ordered
+
+STORE_DIR = Path("data/processed/noaa_vhi")
+FIRST_YEAR = 1982
+
+TS_URL = (
+    "https://www.star.nesdis.noaa.gov/smcd/emb/vci/VH/get_TS_admin.php"
+    "?provinceID={province}&country=BRA&yearlyTag=Weekly&type=Parea_VHI"
+    "&TagCropland=ACOF&year1={year1}&year2={year2}"
+)
+
+# mesmas provinceID dos mapas do código 9
+PROVINCES = {
+    "Minas_Gerais": 13,
+    "Sao_Paulo": 25,
+    "Espirito_Santo": 8,
+    "Rondonia": 22,
+    "Bahia": 5,
+}
+
+MAX_WORKERS = env_int("NOAA_VHI_MAX_WORKERS", 3)
+
+_DATA_LINE = re.compile(r"^\s*\d{4}\s*,")
+
+
+def parse_ts(text: str) -> pd.DataFrame:
+    """Linhas "ano, semana, valores..." da resposta; cabeçalho e rodapé ignorados."""
+    lines = text.replace("<br>", "\n").splitlines()
+    data = [ln for ln in lines if _DATA_LINE.match(ln)]
+    if not data:
+        return pd.DataFrame(columns=["year", "week"])
+    df = pd.read_csv(io.StringIO("\n".join(data)), header=None, skipinitialspace=True)
+    df = df.dropna(axis=1, how="all")  # vírgula no fim da linha
+    df.columns = ["year", "week"] + [f"c{i}" for i in range(2, df.shape[1])]
+    return df.astype({"year": int, "week": int})
+
+
+def store_path(region: str, base_dir=STORE_DIR) -> Path:
+    return Path(base_dir) / f"{region}.csv"
+
+
+def load(region: str, base_dir=STORE_DIR) -> pd.DataFrame:
+    path = store_path(region, base_dir)
+    if not path.exists():
+        return pd.DataFrame(columns=["year", "week"])
+    return pd.read_csv(path)
+
+
+def update(
+    region: str,
+    province: int,
+    session: requests.Session | None = None,
+    base_dir=STORE_DIR,
+) -> tuple[pd.DataFrame, int]:
+    """Busca só os anos novos e grava; devolve (série, nº de semanas novas)."""
+    http = session or requests
+    stored = load(region, base_dir)
+    year1 = int(stored["year"].max()) if len(stored) else FIRST_YEAR
+    year2 = date.today().year
+    url = TS_URL.format(province=province, year1=year1, year2=year2)
+    resp = http.get(url, timeout=120)
+    resp.raise_for_status()
+    fresh = parse_ts(resp.text)
+    if fresh.empty:
+        print(f"[WARN] NOAA VHI {region}: nenhuma linha em {year1}-{year2}.")
+        return stored, 0
+
+    known = set(zip(stored["year"], stored["week"]))
+    added = sum((y, w) not in known for y, w in zip(fresh["year"], fresh["week"]))
+    # o trecho rebaixado substitui o guardado (semanas revisadas pela NOAA)
+    merged = pd.concat([stored, fresh], ignore_index=True)
+    merged = merged.drop_duplicates(["year", "week"], keep="last")
+    merged = merged.sort_values(["year", "week"]).reset_index(drop=True)
+
+    path = store_path(region, base_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".csv.part")
+    merged.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return merged, added
+
+
+def update_all(provinces=PROVINCES, max_workers: int = MAX_WORKERS) -> dict:
+    """Atualiza todas as províncias em paralelo; {região: série}."""
+    session = requests.Session()
+
+    def task(item):
+        region, province = item
+        try:
+            return update(region, province, session)
+        except requests.RequestException as e:
+            print(f"[ERRO] NOAA VHI {region}: {e}")
+            return load(region), 0
+
+    results = map_ordered(task, provinces.items(), max_workers)
+    out = {}
+    for region, (df, added) in zip(provinces, results):
+        last = f"{df['year'].iloc[-1]}-W{df['week'].iloc[-1]:02d}" if len(df) else "-"
+        print(f"[OK] NOAA VHI {region}: {added} semanas novas | {len(df)} | {last}")
+        out[region] = df
+    return out
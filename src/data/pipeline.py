@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# Pipeline diário: executa os códigos 1–9 como um grafo de dependências num único
+# processo. Fontes independentes rodam em paralelo e uma falha só bloqueia os jobs
+# que dependem dela.
+#
+# Uso (igual no Linux e no Windows, a partir de qualquer pasta):
+#   python src/data/pipeline.py                  -> todos os jobs
+#   python src/data/pipeline.py chuva temp_min   -> só esses (e suas dependências)
+#   python src/data/pipeline.py --list
+
+import argparse
+import csv
+import importlib
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+from concurrency import env_int
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+INPUT_XLSX = "data/raw/Brazil Tracking Municipalities.xlsx"
+LOG_CSV = "data/interim/pipeline_runs.csv"
+
+
+# =========================
+# Jobs
+# =========================
+def load_municipios(results):
+    # lida uma única vez e repassada aos scrapers que usam a planilha
+    import pandas as pd
+
+    return pd.read_excel(INPUT_XLSX)
+
+
+def warm_up_meteologix(results):
+    # aquece o cliente compartilhado (cookies + CSRF) antes dos jobs meteologix
+    from meteologix_client import get_client
+
+    get_client().warm_up()
+
+
+def call(module_name: str, func_name: str = "main", municipios: bool = False):
+    def job(results):
+        func = getattr(importlib.import_module(module_name), func_name)
+        return func(results["municipios"]) if municipios else func()
+
+    return job
+
+
+# nome: (função, dependências)
+JOBS = {
+    "municipios": (load_municipios, ()),
+    "meteologix": (warm_up_meteologix, ()),
+    "gfs_chuva": (call("codigo1_gfs_forecast"), ("meteologix",)),
+    "gfs_temp_min": (call("codigo2_gfs_mintemp"), ("meteologix",)),
+    "cecafe": (call("codigo3_baixar_excel_cecafe"), ()),
+    "somar": (call("codigo4_baixar_meteorologia_somar"), ()),
+    "ventos": (call("codigo5_scraping_ventos_wunderground"), ()),
+    "cepea": (call("codigo6_cepea_e_outras_fontes", "cepea"), ()),
+    "noaa_vhi_ts": (call("codigo6_cepea_e_outras_fontes", "noaa_vhi"), ()),
+    "usd_brl": (call("codigo6_cepea_e_outras_fontes", "usd_brl"), ()),
+    "chuva": (
+        call("codigo7_scrape_rain", municipios=True),
+        ("municipios", "meteologix"),
+    ),
+    "temp_min": (
+        call("codigo8_scrape_temp", municipios=True),
+        ("municipios", "meteologix"),
+    ),
+    "vhi": (call("codigo9_dadosVhi"), ()),
+}
+
+
+# =========================
+# Agendador
+# =========================
+def with_dependencies(names) -> list:
+    selected, stack = set(), list(names)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(JOBS[name][1])
+    return [n for n in JOBS if n in selected]  # ordem de declaração
+
+
+def timed(name, results):
+    func = JOBS[name][0]
+    t0 = time.perf_counter()
+    try:
+        return func(results), None, time.perf_counter() - t0
+    except Exception:
+        return None, traceback.format_exc(), time.perf_counter() - t0
+
+
+def run(names, max_workers: int) -> dict:
+    pending = set(with_dependencies(names))
+    status, durations, results, running = {}, {}, {}, {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        while pending or running:
+            # falha em uma dependência bloqueia (transitivamente) só os dependentes
+            changed = True
+            while changed:
+                changed = False
+                for name in sorted(pending):
+                    bad = [
+                        d
+                        for d in JOBS[name][1]
+                        if status.get(d) in ("falhou", "bloqueado")
+                    ]
+                    if bad:
+                        status[name] = "bloqueado"
+                        pending.discard(name)
+                        changed = True
+                        print(f"[SKIP] {name}: dep. falhou ({', '.join(bad)})")
+
+            for name in [n for n in JOBS if n in pending]:
+                if all(status.get(d) == "ok" for d in JOBS[name][1]):
+                    print(f"[START] {name}")
+                    running[ex.submit(timed, name, dict(results))] = name
+                    pending.discard(name)
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                result, error, durations[name] = fut.result()
+                if error is None:
+                    status[name] = "ok"
+                    results[name] = result
+                    print(f"[OK] {name} ({durations[name]:.1f}s)")
+                else:
+                    status[name] = "falhou"
+                    print(f"[ERRO] {name} ({durations[name]:.1f}s)\n{error}")
+
+    return {n: (status[n], durations.get(n)) for n in JOBS if n in status}
+
+
+def write_log(summary: dict, started_at: str):
+    path = Path(LOG_CSV)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    new_file = not path.exists()
+    with path.open("a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if new_file:
+            w.writerow(["run_at", "job", "status", "duration_s"])
+        for name, (st, dur) in summary.items():
+            w.writerow([started_at, name, st, "" if dur is None else f"{dur:.2f}"])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pipeline diário (códigos 1–9).")
+    parser.add_argument("jobs", nargs="*", help="jobs a rodar (padrão: todos)")
+    parser.add_argument("--list", action="store_true", help="lista os jobs e sai")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=env_int("PIPELINE_MAX_WORKERS", len(JOBS)),
+        help="jobs simultâneos (padrão: PIPELINE_MAX_WORKERS ou todos)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (_, deps) in JOBS.items():
+            print(f"{name:<14} <- {', '.join(deps) or '-'}")
+        return 0
+
+    unknown = [j for j in args.jobs if j not in JOBS]
+    if unknown:
+        parser.error(f"jobs desconhecidos: {', '.join(unknown)}")
+
+    # os scripts usam caminhos relativos à raiz do projeto
+    os.chdir(ROOT_DIR)
+    started_at = datetime.now().isoformat(timespec="seconds")
+    summary = run(args.jobs or list(JOBS), max(1, args.workers))
+    write_log(summary, started_at)
+
+    print("=== Resumo ===")
+    for name, (st, dur) in summary.items():
+        print(f"{name:<14} {st:<10} {'' if dur is None else f'{dur:.1f}s'}")
+    return 0 if all(st == "ok" for st, _ in summary.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
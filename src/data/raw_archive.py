@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Arquivo opcional das respostas brutas (depuração dos códigos 1 e 2). Desligado
+# por padrão; com RAW_ARCHIVE=1 as respostas ficam em memória durante a execução
+# e são gravadas de uma vez, num único JSONL gzip por execução, fora da pasta
+# sincronizada do OneDrive.
+#
+#   data/interim/raw_responses/<dataset>/<AAAAMMDD-HHMMSS>-<pid>.jsonl.gz
+
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+
+RAW_DIR = Path("data/interim/raw_responses")
+
+
+class RawArchive:
+    """Acumula (chave, texto) e grava tudo em `save()`; nada é feito se desligado."""
+
+    def __init__(self, dataset: str, enabled: bool | None = None, base_dir=RAW_DIR):
+        if enabled is None:
+            enabled = os.getenv("RAW_ARCHIVE", "").strip() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.dir = Path(base_dir) / dataset
+        self._items = []
+
+    def add(self, key: str, text: str):
+        if self.enabled and text is not None:
+            self._items.append({"key": key, "t": time.time(), "text": text})
+
+    def save(self) -> Path | None:
+        if not self.enabled or not self._items:
+            return None
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # nome único por execução: duas execuções simultâneas não se sobrescrevem
+        path = self.dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl.gz"
+        tmp = path.with_name(path.name + ".part")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for item in self._items:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+        print(f"[RAW] {len(self._items)} respostas em {path}")
+        self._items.clear()
+        return path
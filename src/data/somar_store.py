@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Histórico das exportações da SOMAR (código 4): uma partição por mês, com as
+# linhas de todas as cidades juntas. Reprocessar um mês substitui só a partição
+# dele, então o backfill de uma safra pode ser refeito mês a mês.
+#
+#   data/processed/somar/<ano>-<mês>.parquet   (.csv sem pyarrow)
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:  # sem pyarrow, grava CSV
+    pyarrow = None
+
+STORE_DIR = Path("data/processed/somar")
+SUFFIX = ".parquet" if pyarrow is not None else ".csv"
+
+
+def read_sheet(path: Path) -> pd.DataFrame:
+    """Planilha da SOMAR: xls/xlsx de verdade ou tabela HTML salva como .xls."""
+    with open(path, "rb") as f:
+        head = f.read(8)
+    if head.startswith((b"\xd0\xcf\x11\xe0", b"PK\x03\x04")):
+        return pd.read_excel(path)
+    return pd.read_html(path, thousands=".", decimal=",")[0]
+
+
+def month_path(year: int, month: int, base_dir=STORE_DIR) -> Path:
+    return Path(base_dir) / f"{year}-{month:02d}{SUFFIX}"
+
+
+def write_month(year: int, month: int, df: pd.DataFrame, base_dir=STORE_DIR):
+    path = month_path(year, month, base_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    df = df.rename(columns=str)  # Parquet exige nomes de coluna texto
+    if SUFFIX == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def load(base_dir=STORE_DIR) -> pd.DataFrame:
+    files = sorted(Path(base_dir).glob(f"*{SUFFIX}"))
+    if not files:
+        return pd.DataFrame()
+    read = pd.read_parquet if SUFFIX == ".parquet" else pd.read_csv
+    return pd.concat((read(f) for f in files), ignore_index=True)
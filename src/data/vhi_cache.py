@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Cache local das imagens VHI (código 9), endereçado por conteúdo: cada PNG é
+# guardado uma vez pelo sha256 e um índice JSON liga (região, ano, semana, URL) ao
+# arquivo e ao veredicto do banner "sem dados". Semanas de anos encerrados não
+# mudam mais na NOAA e são servidas do disco, sem rede. O WeekIndex guarda quais
+# (ano, semana) já têm dados, para achar a semana vigente sem recuar sonda a sonda.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+CACHE_DIR = Path(os.getenv("VHI_CACHE_DIR", ".cache/vhi"))
+TZ_LOCAL = ZoneInfo("America/Sao_Paulo")
+
+
+class VhiImageCache:
+    """Índice (região, ano, semana, URL) -> {sha256, banner} + blobs por sha256."""
+
+    def __init__(self, base_dir=CACHE_DIR):
+        self.base_dir = Path(base_dir)
+        self.index_path = self.base_dir / "index.json"
+        self._lock = threading.Lock()
+        try:
+            self.index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def key(region: str, year: int, week: int, url: str) -> str:
+        return f"{region}|{year}|{week}|{url}"
+
+    @staticmethod
+    def is_final(year: int) -> bool:
+        # ano encerrado: a NOAA não republica as semanas
+        return year < datetime.now(TZ_LOCAL).year
+
+    def _blob(self, sha: str) -> Path:
+        return self.base_dir / "blobs" / sha[:2] / f"{sha}.png"
+
+    def get(self, region: str, year: int, week: int, url: str):
+        """(conteúdo ou None, banner) se a semana está no cache e é definitiva."""
+        if not self.is_final(year):
+            return None
+        with self._lock:
+            entry = self.index.get(self.key(region, year, week, url))
+        if entry is None:
+            return None
+        if entry["banner"]:
+            return None, True
+        try:
+            return self._blob(entry["sha256"]).read_bytes(), False
+        except OSError:
+            return None  # blob sumiu: baixa de novo
+
+    def put(self, region: str, year: int, week: int, url: str, content, banner):
+        entry = {"banner": bool(banner), "fetched_at": time.time()}
+        if not banner:
+            sha = hashlib.sha256(content).hexdigest()
+            path = self._blob(sha)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(path.name + f".{threading.get_ident()}.part")
+                tmp.write_bytes(content)
+                os.replace(tmp, path)
+            entry["sha256"] = sha
+        with self._lock:
+            self.index[self.key(region, year, week, url)] = entry
+
+    def save(self):
+        """Grava o índice (uma vez por execução, ao final)."""
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_name("index.json.part")
+        with self._lock:
+            tmp.write_text(json.dumps(self.index, indent=1), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+
+class WeekIndex:
+    """Disponibilidade (ano, semana) na NOAA, persistida entre execuções.
+
+    "ok" é definitivo (a semana foi publicada); "sem dados" vale para anos
+    encerrados ou por `missing_ttl` horas no ano corrente, já que a semana mais
+    recente costuma aparecer dias depois.
+    """
+
+    def __init__(self, base_dir=CACHE_DIR, missing_ttl: float = 12.0):
+        self.path = Path(base_dir) / "weeks.json"
+        self.missing_ttl = missing_ttl
+        self._lock = threading.Lock()
+        try:
+            self.weeks = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.weeks = {}
+
+    def status(self, year: int, week: int) -> bool | None:
+        """True (publicada), False (sem dados, ainda válido) ou None (desconhecida)."""
+        with self._lock:
+            entry = self.weeks.get(f"{year}-{week}")
+        if entry is None:
+            return None
+        if entry["ok"]:
+            return True
+        age_h = (time.time() - entry["t"]) / 3600
+        if VhiImageCache.is_final(year) or age_h < self.missing_ttl:
+            return False
+        return None  # "sem dados" antigo no ano corrente: sonda de novo
+
+    def record(self, year: int, week: int, ok: bool):
+        with self._lock:
+            entry = self.weeks.get(f"{year}-{week}")
+            if entry and entry["ok"] and not ok:
+                return  # publicada não volta a "sem dados"
+            self.weeks[f"{year}-{week}"] = {"ok": bool(ok), "t": time.time()}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name("weeks.json.part")
+        with self._lock:
+            tmp.write_text(json.dumps(self.weeks, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Montagem das figuras combinadas do VHI (código 9) em memória, a partir de uma
+# especificação declarativa: cada saída é uma faixa horizontal ou vertical de
+# peças, e uma peça pode ser uma imagem baixada ou outra saída já montada (sem
+# reabrir PNG do disco). Os mapas da NOAA compartilham a mesma paleta, então a
+# montagem é feita direto no modo "P" (1 byte/pixel) e o PNG final sai com paleta
+# e compressão otimizada, bem menor que o RGB de antes.
+
+import os
+
+import numpy as np
+from PIL import Image
+
+WHITE = (255, 255, 255)
+
+
+def shared_palette(images) -> list | None:
+    """Paleta comum se todas as imagens são "P" com a mesma paleta (e sem alpha)."""
+    first = images[0]
+    if first.mode != "P" or "transparency" in first.info:
+        return None
+    palette = first.getpalette()
+    for im in images[1:]:
+        if im.mode != "P" or "transparency" in im.info or im.getpalette() != palette:
+            return None
+    return palette
+
+
+def palette_index(palette: list, rgb=WHITE) -> int | None:
+    for i in range(len(palette) // 3):
+        if tuple(palette[3 * i : 3 * i + 3]) == rgb:
+            return i
+    return None
+
+
+def to_palette(img: Image.Image) -> Image.Image:
+    """Converte para "P" sem perda se há no máximo 256 cores; senão devolve igual."""
+    if img.mode == "P" or img.getcolors(256) is None:
+        return img
+    rgb = np.asarray(img.convert("RGB"), dtype=np.uint32)
+    packed = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    colors, idx = np.unique(packed, return_inverse=True)
+    out = Image.fromarray(idx.reshape(packed.shape).astype(np.uint8), "P")
+    lut = np.stack([colors >> 16, (colors >> 8) & 255, colors & 255], axis=1)
+    out.putpalette(lut.astype(np.uint8).tobytes())
+    return out
+
+
+def compose(images, direction: str) -> Image.Image:
+    """Imagens lado a lado ("h") ou empilhadas ("v"), centralizadas, fundo branco."""
+    horizontal = direction == "h"
+    if horizontal:
+        size = (sum(i.width for i in images), max(i.height for i in images))
+    else:
+        size = (max(i.width for i in images), sum(i.height for i in images))
+
+    palette = shared_palette(images)
+    bg = palette_index(palette) if palette else None
+    if bg is not None:
+        canvas = Image.new("P", size, bg)
+        canvas.putpalette(palette)
+    else:
+        canvas = Image.new("RGB", size, WHITE)
+
+    offset = 0
+    for im in images:
+        if horizontal:
+            canvas.paste(im, (offset, (size[1] - im.height) // 2))
+            offset += im.width
+        else:
+            canvas.paste(im, ((size[0] - im.width) // 2, offset))
+            offset += im.height
+    return canvas
+
+
+def save_png(img: Image.Image, path: str) -> int:
+    """Grava uma vez, com paleta quando couber e compressão máxima; devolve bytes."""
+    to_palette(img).save(path, format="PNG", optimize=True)
+    return os.path.getsize(path)
+
+
+def build_layouts(tiles: dict, layouts: dict, output_dir: str) -> dict:
+    """Monta e grava, na ordem, cada saída de `layouts` {arquivo: (direção, peças)}.
+
+    Peças são chaves de `tiles` (imagens já decodificadas) ou nomes de saídas
+    anteriores. Imagens ausentes são puladas; se faltar uma saída anterior, a
+    figura não é gravada (como antes). Devolve {arquivo: imagem montada}.
+    """
+    built = {}
+    for name, (direction, parts) in layouts.items():
+        images = [built[p] if p in built else tiles.get(p) for p in parts]
+        missing = [p for p, im in zip(parts, images) if im is None]
+        images = [im for im in images if im is not None]
+        if any(p in layouts for p in missing):
+            print(f"[ERRO] {name}: figuras não encontradas: {missing}")
+            continue
+        if missing:
+            print(f"[WARN] {name}: sem {missing}")
+        if not images:
+            print(f"[ERRO] {name}: nenhuma imagem para combinar")
+            continue
+        built[name] = compose(images, direction)
+        out = os.path.join(output_dir, name)
+        size = save_png(built[name], out)
+        print(f"[OK] Combinada: {out} ({size / 1024:.0f} KB)")
+    return built
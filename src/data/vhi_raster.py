@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# Decodifica os mapas VHI da NOAA (código 9) em rasters numéricos. Os PNGs vêm com
+# uma paleta fixa em que o índice de cor é o próprio VHI: entrada i = VHI i-1
+# (0–100, classes da legenda 0/6/12/24/36/48/60/72/84). A entrada 1 (magenta)
+# também é usada nas linhas sobrepostas ao mapa, então fica como "sem dado"; as
+# entradas 102+ são água, bordas, texto e fundo.
+#
+# Cada (região, ano, semana) vira um .npy uint8 (255 = sem dado), lido com
+# mmap_mode="r"; um CSV guarda VHI médio e % da área sob estresse por região.
+
+import csv
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+RASTER_DIR = Path("data/interim/vhi_rasters")
+STATS_CSV = Path("data/processed/vhi_stats.csv")
+
+NODATA = 255
+STRESS_VHI = 40  # VHI < 40: vegetação sob estresse (NOAA)
+SEVERE_VHI = 12
+
+# índice da paleta -> VHI (uint8), aplicado de uma vez sobre o array de índices
+PALETTE_LUT = np.full(256, NODATA, dtype=np.uint8)
+PALETTE_LUT[2:102] = np.arange(1, 101, dtype=np.uint8)
+
+# cores de referência da paleta NOAA, para conferir que a imagem é a esperada
+_PALETTE_CHECK = {7: (240, 0, 80), 49: (85, 255, 85), 85: (0, 0, 170)}
+
+STATS_FIELDS = [
+    "region",
+    "year",
+    "week",
+    "mean_vhi",
+    "median_vhi",
+    "pct_stress",
+    "pct_severe",
+    "valid_px",
+]
+
+
+def decode_vhi(img: Image.Image) -> np.ndarray:
+    """Raster uint8 de VHI (0–100; 255 = sem dado) a partir do PNG com paleta."""
+    if img.mode != "P":
+        raise ValueError(f"esperado PNG com paleta (modo P), veio {img.mode}")
+    palette = img.getpalette() or []
+    for i, rgb in _PALETTE_CHECK.items():
+        if tuple(palette[3 * i : 3 * i + 3]) != rgb:
+            raise ValueError("paleta diferente da legenda VHI da NOAA")
+    return PALETTE_LUT[np.asarray(img)]
+
+
+def vhi_stats(raster: np.ndarray) -> dict:
+    """VHI médio/mediano e % da área sob estresse (só pixels com dado)."""
+    valid = raster[raster != NODATA]
+    n = valid.size
+    if n == 0:
+        return {k: "" for k in STATS_FIELDS[3:-1]} | {"valid_px": 0}
+    return {
+        "mean_vhi": round(float(valid.mean()), 2),
+        "median_vhi": float(np.median(valid)),
+        "pct_stress": round(100.0 * np.count_nonzero(valid < STRESS_VHI) / n, 2),
+        "pct_severe": round(100.0 * np.count_nonzero(valid < SEVERE_VHI) / n, 2),
+        "valid_px": int(n),
+    }
+
+
+class RasterStore:
+    """Rasters VHI em `data/interim/vhi_rasters/<região>/<ano>-W<semana>.npy`."""
+
+    def __init__(self, base_dir=RASTER_DIR):
+        self.base_dir = Path(base_dir)
+
+    def path(self, region: str, year: int, week: int) -> Path:
+        return self.base_dir / region / f"{year}-W{week:02d}.npy"
+
+    def save(self, region: str, year: int, week: int, raster: np.ndarray):
+        path = self.path(region, year, week)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".part.npy")
+        np.save(tmp, raster)
+        os.replace(tmp, path)
+
+    def load(self, region: str, year: int, week: int) -> np.ndarray:
+        """Raster mapeado em memória (só leitura): nada é lido até ser usado."""
+        return np.load(self.path(region, year, week), mmap_mode="r")
+
+    def keys(self, region: str | None = None) -> list:
+        pattern = f"{region}/*.npy" if region else "*/*.npy"
+        out = []
+        for p in sorted(self.base_dir.glob(pattern)):
+            if p.name.endswith(".part.npy"):
+                continue
+            year, week = p.stem.split("-W")
+            out.append((p.parent.name, int(year), int(week)))
+        return out
+
+
+def update_stats(rows: list, path=STATS_CSV):
+    """Acrescenta/substitui as linhas (região, ano, semana) no CSV de estatísticas."""
+    path = Path(path)
+    table = {}
+    if path.exists():
+        with path.open(newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                table[(r["region"], int(r["year"]), int(r["week"]))] = r
+    for r in rows:
+        table[(r["region"], int(r["year"]), int(r["week"]))] = r
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=STATS_FIELDS)
+        w.writeheader()
+        for key in sorted(table):
+            w.writerow({k: table[key].get(k, "") for k in STATS_FIELDS})
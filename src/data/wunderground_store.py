@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Histórico diário das estações PWS do Weather Underground (código 5), uma
+# partição por estação e mês. O backfill consulta as datas já guardadas para só
+# baixar os meses que ainda faltam (ou o mês corrente, que segue mudando).
+#
+#   data/processed/winds/<estação>/<ano>-<mês>.parquet   (.csv sem pyarrow)
+
+import os
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:  # sem pyarrow, grava CSV
+    pyarrow = None
+
+STORE_DIR = Path("data/processed/winds")
+SUFFIX = ".parquet" if pyarrow is not None else ".csv"
+
+
+def month_path(station: str, year: int, month: int, base_dir=STORE_DIR) -> Path:
+    return Path(base_dir) / station / f"{year}-{month:02d}{SUFFIX}"
+
+
+def _read(path: Path) -> pd.DataFrame:
+    if SUFFIX == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path, parse_dates=["date"])
+
+
+def stored_dates(station: str, year: int, month: int, base_dir=STORE_DIR) -> set:
+    path = month_path(station, year, month, base_dir)
+    if not path.exists():
+        return set()
+    return set(_read(path)["date"].dt.date)
+
+
+def fetched_on(station: str, year: int, month: int, base_dir=STORE_DIR):
+    """Data em que a partição foi gravada (None se não existe)."""
+    path = month_path(station, year, month, base_dir)
+    if not path.exists():
+        return None
+    return date.fromtimestamp(path.stat().st_mtime)
+
+
+def write_month(station: str, year: int, month: int, df, base_dir=STORE_DIR):
+    path = month_path(station, year, month, base_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    if SUFFIX == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def load(station: str, base_dir=STORE_DIR) -> pd.DataFrame:
+    files = sorted((Path(base_dir) / station).glob(f"*{SUFFIX}"))
+    if not files:
+        return pd.DataFrame(columns=["date"])
+    return pd.concat((_read(f) for f in files), ignore_index=True)